@@ -6,6 +6,9 @@ import signal
 
 from string import Template
 
+# Must be imported first to profile the imports below.
+from adele_app.startup_profile import profiler, BUDGET as STARTUP_BUDGET
+
 from peewee import locales
 from peewee.debug import GET_LOGGER, CHECK_LEAKS
 from peewee.notifier import Task
@@ -25,18 +28,29 @@ log = GET_LOGGER(__name__)
 platform = get_platform()  # 'v4', 'v5', 'mini-v5' or 'v6'.
 features_cec = "cec" in features
 
+# Staged startup: start the view manager and the boot sequence first,
+# then run the non critical initializations as background tasks.
+staged_startup = os.getenv("STAGED_STARTUP", "0").lower() in (
+    "1", "y", "yes", "true")
+
 
 def _init_input_plugins():
     # Must be called before any input_plugins loading!
     # Needed for Netflix.
     use_nte_events()
+    _init_keyboard_plugin()
+    _init_remote_control_plugin()
 
+
+def _init_keyboard_plugin():
     # Activate optional keyboard plugin (for debug only).
     if os.getenv("KEYBOARD", "0").lower() in ("1", "y", "yes", "true"):
         input_plugins.init("keyboard")
         input_plugins.keyboard.THREADED = False
         input_plugins.keyboard.InputInterface.quit = lambda _: cleanup()
 
+
+def _init_remote_control_plugin():
     if platform == "v4":
         input_plugin = "linux_event"
     elif platform == "v6":
@@ -46,6 +60,28 @@ def _init_input_plugins():
     input_plugins.init(input_plugin)
 
 
+def _init_cec():
+    # Specific CEC initialization
+    from leon_mal.services.cec import CECManager
+    # Initialize CEC
+    log.info("Initialize CEC service")
+    MediaRoot().update_services(cec=CECManager)
+
+
+def _run_deferred_inits(inits):
+    """Run the ``(name, function)`` initializations in order, one per
+    main loop iteration so the splash screen keeps being rendered.
+    """
+    for name, init in inits:
+        with profiler.block(name):
+            try:
+                init()
+            except Exception, e:
+                log.exception("Deferred %s initialization failed: %r",
+                              name, e)
+        yield 0
+
+
 def _init_internationalization():
     if platform == "v6":
         locales.LOCALE_DIR = "/mnt/nte/share/locale/"
@@ -95,23 +131,45 @@ def startup():
         Template.pattern.pattern.replace("_a-z0-9", "_a-z/0-9"),
         re.IGNORECASE | re.VERBOSE)
 
-    _init_input_plugins()
-    _init_internationalization()
-    setup_profile()
+    # Deferred initializations, by priority: the remote control plugin
+    # is needed by the first key press, CEC by the first standby.
+    deferred_inits = []
+    if staged_startup:
+        # Must be called before any input_plugins loading!
+        use_nte_events()
+        deferred_inits.append(("input_plugins", _init_remote_control_plugin))
+    else:
+        with profiler.block("input_plugins"):
+            _init_input_plugins()
+    with profiler.block("internationalization"):
+        _init_internationalization()
+    with profiler.block("profile"):
+        setup_profile()
 
     if features_cec:
-        # Specific CEC initialization
-        from leon_mal.services.cec import CECManager
-        # Initialize CEC
-        log.info("Initialize CEC service")
-        MediaRoot().update_services(cec=CECManager)
-
-    start_boot_sequence()
-
-    from wuk import application
-    from wydgets.engine import ViewManager
-    application.stacks = ("background", "main", "popup", "top")
-    application.engines.append(ViewManager())
+        if staged_startup:
+            deferred_inits.append(("cec", _init_cec))
+        else:
+            with profiler.block("cec"):
+                _init_cec()
+
+    with profiler.block("boot_sequence"):
+        start_boot_sequence()
+
+    if staged_startup:
+        deferred_inits.append(("keyboard_plugin", _init_keyboard_plugin))
+        Task(_run_deferred_inits(deferred_inits)).start()
+
+    with profiler.block("view_manager"):
+        from wuk import application
+        from wydgets.engine import ViewManager
+        application.stacks = ("background", "main", "popup", "top")
+        application.engines.append(ViewManager())
+    if not profiler.write_report("startup", STARTUP_BUDGET):
+        # Reported again in the boot stage report.
+        name, duration = max(profiler.blocks, key=lambda block: block[1])
+        log.warning("Startup over budget, slowest block: %s (%.3fs)",
+                    name, duration)
     application.run()
 
 
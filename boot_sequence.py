@@ -4,6 +4,8 @@ Boot sequence
 """
 
 import os
+from functools import wraps
+from inspect import isgeneratorfunction
 
 from peewee.debug import GET_LOGGER
 from peewee.notifier import Task
@@ -40,6 +42,18 @@ from adele_app.pages.error.sw_update_download import SWUpdateDownloadPage
 from adele_app.tools.error_cluster_management import ErrorClusterManager
 from leon_mal.services.btapi import BTAPIService, SHOW_CASE_ON_GOING, SHOW_CASE_OK
 from adele_app.stand_by import is_passive_standby_enabled
+from adele_app.boot_snapshot import (load_snapshot, save_snapshot,
+                                     invalidate_snapshot, snapshot_path)
+from adele_app.channel_index import ChannelIndex
+from adele_app.epg_prefetch import EpgPrefetcher
+from adele_app.page_registry import PageRegistry
+from adele_app.readiness import (NameOwnerWatcher, ReadinessSet,
+                                 wait_for_bus_name)
+from adele_app.retry import RetrySchedule, retry_stats
+from adele_app.startup_profile import profiler
+from adele_app.step_graph import StepGraph
+from adele_app.tracing import Timeline, trace_output_path
+from adele_app.webaccess_cache import WebaccessCache
 
 from leon_mal.platform import platform
 
@@ -59,31 +73,69 @@ SW_UPDATE_ACTIVE = (SW_UPDATE_DOWNLOAD,
 SW_UPDATE_FAILURE = (SW_UPDATE_NAND_WRITE_FAILED, SW_UPDATE_DOWNLOAD_FAILED)
 STATUS_NOT_READY = list(TRY_AGAIN) + [STB_ASSIGNED, OCI_NETWORK_TIMEOUT]
 
+# Boot timeline output, set BOOT_TRACE=0 to disable the dump.
+BOOT_TRACE_PATH = trace_output_path("BOOT_TRACE", "/tmp/boot_trace.json")
+# Broadcasted documents the boot does not wait for, comma separated.
+BOOT_SKIPPED_DOCUMENTS = tuple(
+    os.getenv("BOOT_SKIPPED_DOCUMENTS", "MESSAGES").split(","))
+# Warm boot snapshot, disabled unless BOOT_SNAPSHOT is set.
+BOOT_SNAPSHOT_PATH = snapshot_path()
+# Help browser page and webaccess entries warmed after the boot so the
+# first help key press does not pay their import and resolution.
+HELP_PRELOAD_PAGES = ("ImlBrowserPage",)
+PREWARMED_WEBACCESS = ("HELP",)
+
+
+def traced_node(method):
+    """Record the run of a boot node in the boot timeline.
+
+    Generator nodes are traced from their first iteration to their
+    end, each ``yield`` is counted as a retry.
+    """
+    name = method.__name__
+
+    def _traced_generator(timeline, generator):
+        timeline.begin(name)
+        try:
+            for step in generator:
+                timeline.count(name)
+                yield step
+        finally:
+            timeline.end_wait(name)
+            timeline.end(name)
+
+    if isgeneratorfunction(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            return _traced_generator(self.timeline,
+                                     method(self, *args, **kwargs))
+    else:
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            self.timeline.begin(name)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.timeline.end(name)
 
-def wait_dr_repair_check(f):
-    import time
-    from wydbus import WyDbus
-    from com import dbus
-
-    # This was done normaly by the initng
-    # But we need to boot even if ocid is not here
-    # To avoid missleading information in doctor repair
-    # wait a bit to let ocid boot
-    dbus = dbus(bus=WyDbus(), name="org.freedesktop.DBus")
-
-    def try_to_wait_ocid(cpt=6):
-        if not cpt:
-            return
-
-        if not dbus.NameHasOwner("com.wyplay.oci"):
-            log.info("DrRepair :: Trying to wait for OCID")
-            time.sleep(0.5)
-            try_to_wait_ocid(cpt - 1)
+    return wrapper
 
-    def launch_dr_repair(*args, **kwargs):
 
-        try_to_wait_ocid()
+def wait_dr_repair_check(f):
 
+    def launch_dr_repair(*args, **kwargs):
+        # This was done normaly by the initng
+        # But we need to boot even if ocid is not here
+        # To avoid missleading information in doctor repair
+        # wait a bit to let ocid boot, without blocking the main loop
+        def _ocid_checked(has_owner):
+            if not has_owner:
+                log.info("DrRepair :: OCID not on the bus, going on")
+            show_dr_repair(*args, **kwargs)
+
+        wait_for_bus_name("com.wyplay.oci", _ocid_checked, timeout=3.0)
+
+    def show_dr_repair(*args, **kwargs):
         # Get/set language for Self doctor Repair trads
         # when booting without network
         lang = get_config_language()
@@ -111,6 +163,7 @@ class BootSequence(object):
     __metaclass__ = MetaSingleton
 
     def __init__(self):
+        self.timeline = Timeline("boot")
         self.first_page = 'main_hub'
         self.send_avr = False
         self._is_signal_connected = False
@@ -120,10 +173,30 @@ class BootSequence(object):
         self.save_pbu_lang = None
         self._sw_update_failure_cb = None
         self.is_migration = None
-        self._retrieve_migration_status()
+        # State of the last complete boot, if still valid. When set, the
+        # pages are built as soon as the renderer is started and the
+        # regular checks only confirm it.
+        self.snapshot = None
+        self._snapshot_boot = False
+        self._boot_status = None
+        self._showcase_status = None
+        self._pending_documents = None
+        self._document_callbacks = {}
+        # Steps of the running finish, cancelled if it runs again after
+        # a dropped snapshot.
+        self._finish_graph = None
+        self._boot_done = False
+        if BOOT_SNAPSHOT_PATH is not None:
+            self.snapshot = load_snapshot(BOOT_SNAPSHOT_PATH)
+        if self.snapshot is not None:
+            self.is_migration = self.snapshot["is_migration"]
+            Task(self._retrieve_migration_status).start()
+        else:
+            self._retrieve_migration_status()
         self._init_front_panel()
         self.start()
 
+    @traced_node
     def _retrieve_migration_status(self):
         migration = MediaRoot().get_service("migration")
         try:
@@ -137,8 +210,11 @@ class BootSequence(object):
             # TODO: add comment to explain why this is needed!
             from leon_mal.userconfigmgmt import UserConfigMgmt
             UserConfigMgmt.flush_cache()
-        self.is_migration = migration_status == "MIGRATION_DONE"
+        is_migration = migration_status == "MIGRATION_DONE"
         log.info("Migration status is %s.", migration_status)
+        if self.snapshot is not None and is_migration != self.is_migration:
+            self._drop_snapshot("migration status is %s" % migration_status)
+        self.is_migration = is_migration
 
     def _init_front_panel(self):
         log.info("Initialize front panel.")
@@ -161,15 +237,16 @@ class BootSequence(object):
             bootpage = BootPage()
             bootpage.show()
 
+    @traced_node
     def _start(self):
         log.info("[BOOT] start")
+        self.timeline.end("dr_repair_check")
 
         # launch the error manager
         ErrorClusterManager()
         BootPage().show()
 
-        Task(self.loop_check_middleware()).start(delay=3, loop=True,
-                                                 init_delay=1)
+        Task(self.loop_check_middleware()).start(init_delay=1)
 
     def start(self):
         """
@@ -179,8 +256,10 @@ class BootSequence(object):
         Initialize the components that are not dependent to the
         middleware.
         """
+        self.timeline.begin("dr_repair_check")
         wait_dr_repair_check(self._start)()
 
+    @traced_node
     def loop_check_middleware(self):
         """Middleware components start Node.
 
@@ -197,48 +276,87 @@ class BootSequence(object):
             unused_provider = ("storage", "teletext", "nxlauncher",
                                "cpc", "webbrowser")
 
-        max_tries = 20 * 10  # (3 x 20 = 60 sec) x 10 = 10 min
-        for i in range(max_tries):
-
-            for middleware in profile.selected['providers'].keys():
-                if (not MediaRoot().is_provider_connected(middleware) and
-                        middleware not in unused_provider):
+        required = [middleware
+                    for middleware in profile.selected['providers'].keys()
+                    if middleware not in unused_provider]
+        readiness = ReadinessSet(required, callback=self._middleware_ready,
+                                 name="middleware")
+
+        def _wait_for_pending():
+            # The wait is on every provider still missing, not on one of
+            # them.
+            if readiness.pending:
+                self.timeline.wait_for("loop_check_middleware",
+                                       ", ".join(sorted(readiness.pending)))
+
+        def _name_owner_changed(name, new_owner):
+            # Any new bus owner may be a provider: check the pending ones.
+            readiness.refresh(MediaRoot().is_provider_connected)
+            _wait_for_pending()
+
+        # Providers are started as soon as they appear on DBUS, the poll
+        # below is only a watchdog in case a notification is missed.
+        NameOwnerWatcher().register(_name_owner_changed)
+        schedule = RetrySchedule("loop_check_middleware")
+        try:
+            while not schedule.expired:
+                if readiness.refresh(MediaRoot().is_provider_connected):
+                    schedule.succeed(at=readiness.ready_at)
+                    break
+                for middleware in sorted(readiness.pending):
                     log.info("Middleware provider %r is not connected.",
                              middleware)
-                    break
+                _wait_for_pending()
+                yield schedule.next_delay()  # RETRY
             else:
-                # Start UI services
-                Services().start()
-
-                # Launch the connection to the renderer
-                def renderer_started(request):
-                    if request.is_failed():
-                        # FIXME: Remove this custom error message.
-                        # Must be replaced by a charted error
-                        ErrorPage(
-                            title=_("FAILED TO LAUNCH THE TV PLAYER"),
-                            description=_("Impossible to launch the TV player."),
-                            error_message=_("Error code=%r" %
-                                            request.return_code)).show()
-                        self.hide_splashscreen()
-                        return
-
-                    Task(self.loop_check_alternative_flow()).start(
-                        delay=3, loop=True, init_delay=0.1)
-
-                TVPlayer().start_renderer(callback=renderer_started)
-                break
+                readiness.cancel()
+                # FIXME: Remove this custom error message.
+                ErrorPage(
+                    title="Middleware Timeout Error",
+                    description="Unable to start the middleware.",
+                    error_message="10 min timeout reached. "
+                                  "Please restart.").show()
+                self.hide_splashscreen()
+        finally:
+            NameOwnerWatcher().unregister(_name_owner_changed)
 
-            yield  # RETRY
+    def _middleware_ready(self):
+        """Start the UI services and the renderer once all the
+        middleware providers are connected.
+        """
+        self.timeline.end_wait("loop_check_middleware")
+        # Start UI services
+        Services().start()
+
+        # Launch the connection to the renderer
+        self.timeline.begin("start_renderer", category="wait")
+
+        def renderer_started(request):
+            self.timeline.end("start_renderer", category="wait",
+                              return_code=request.return_code)
+            if request.is_failed():
+                # FIXME: Remove this custom error message.
+                # Must be replaced by a charted error
+                ErrorPage(
+                    title=_("FAILED TO LAUNCH THE TV PLAYER"),
+                    description=_("Impossible to launch the TV player."),
+                    error_message=_("Error code=%r" %
+                                    request.return_code)).show()
+                self.hide_splashscreen()
+                return
+
+            if self.snapshot is not None:
+                # Warm boot: build the pages now, the alternative flow
+                # and document checks confirm the snapshot meanwhile.
+                log.info("[BOOT] warm boot from snapshot")
+                self.timeline.instant("snapshot_boot", category="snapshot")
+                self._snapshot_boot = True
+                Task(self.finish).start()
+            Task(self.loop_check_alternative_flow()).start(init_delay=0.1)
 
-        else:
-            # FIXME: Remove this custom error message.
-            ErrorPage(
-                title="Middleware Timeout Error",
-                description="Unable to start the middleware.",
-                error_message="10 min timeout reached. Please restart.").show()
-            self.hide_splashscreen()
+        TVPlayer().start_renderer(callback=renderer_started)
 
+    @traced_node
     def loop_check_alternative_flow(self):
         """Alternative boot flow check Node.
 
@@ -248,9 +366,10 @@ class BootSequence(object):
          - First install
         """
         log.info("[BOOT] loop_check_alternative_flow")
-        max_tries = 20 * 10  # (3 x 20 = 60 sec) x 10 = 10 min
+        schedule = RetrySchedule("loop_check_alternative_flow")
         ocid = OCIDService()
-        for i in range(max_tries):
+        update_status = assign_status = None
+        while not schedule.expired:
             try:
                 update_status = ocid.sw_update_state_get()
                 assign_status = ocid.boot_status_get()
@@ -260,12 +379,15 @@ class BootSequence(object):
                 # to come back on the bus
                 #  -> Try again
                 log.error("OCID is not on DBus... try again")
-                yield
+                self.timeline.wait_for("loop_check_alternative_flow", "OCID")
+                yield schedule.next_delay()
+                continue
 
             if update_status in SW_UPDATE_ACTIVE:
                 # Alternative flow: Show software update Root page
                 log.info("A software update is currently in progress: "
                          "update status = %s", update_status)
+                self._drop_snapshot("software update %s" % update_status)
 
                 sw_update_page = SWUpdateDownloadPage(
                     title=_("[SW_UPDATE]SOFTWARE DOWNLOAD"),
@@ -286,7 +408,7 @@ class BootSequence(object):
                         self._sw_update_failure_cb = None
 
                     Task(self.loop_check_alternative_flow()).start(
-                        delay=3, loop=True, init_delay=0.1)
+                        init_delay=0.1)
 
                 self._sw_update_failure_cb = _handle_sw_update_failure
                 ocid.register(
@@ -302,6 +424,7 @@ class BootSequence(object):
 
             elif assign_status in STB_IS_NOT_ASSIGNED_TRIGGERS:
                 # Alternative flow: Show first install Root page
+                self._drop_snapshot("boot status %s" % assign_status)
 
                 self.first_page = 'pin_code_change'
                 from adele_app.pages.first_install.neutral_language import \
@@ -322,6 +445,7 @@ class BootSequence(object):
             elif ((update_status == NO_SW_UPDATE or
                     update_status in SW_UPDATE_FAILURE) and
                     assign_status == STB_ASSIGNED):
+                self._boot_status = (update_status, assign_status)
                 Task(self.loop_check_document_parsing).start()
                 break
 
@@ -329,11 +453,14 @@ class BootSequence(object):
                   assign_status in STATUS_NOT_READY):
                 log.info("SW update=%r or Boot status=%r not ready.",
                          update_status, assign_status)
-                yield  # RETRY
+                self.timeline.wait_for("loop_check_alternative_flow",
+                                       "sw_update/boot_status")
+                yield schedule.next_delay()  # RETRY
 
             else:
                 log.info("SW update=%r or Boot status=%r not ready.",
                          update_status, assign_status)
+                self._drop_snapshot("boot status %s" % assign_status)
                 from peewee.request import Request
                 req = Request()
                 req.start()
@@ -344,6 +471,7 @@ class BootSequence(object):
         else:
             status_message = ("SW update status:%r, Boot status:%r." %
                               (update_status, assign_status))
+            self._drop_snapshot("startup timeout")
             # FIXME: Remove this custom error message.
             # Must be replaced by the STB assign screen flow
             ErrorPage(
@@ -351,7 +479,10 @@ class BootSequence(object):
                 description=_("Please restart."),
                 error_message=status_message).show()
             self.hide_splashscreen()
+            return
+        schedule.succeed()
 
+    @traced_node
     def loop_check_document_parsing(self):
         """Document parsing Node.
 
@@ -359,64 +490,174 @@ class BootSequence(object):
         run the application have been parsed.
         """
         log.info("[BOOT] loop_check_document_parsing")
-        brocker_document_dict = OCIDService().broker_document_state_dict
+        ocid = OCIDService()
+        self._clear_document_callbacks()
+        pending = []
         # Check that each broadcasted document is parsed
-        for document, state in brocker_document_dict.iteritems():
-            if document is "MESSAGES":
-                log.info("[BOOT] bypassing MESSAGES.xml parsing dependency")
-                continue
-
-            if state != PARSED:
+        for document, state in ocid.broker_document_state_dict.iteritems():
+            if document in BOOT_SKIPPED_DOCUMENTS:
+                log.info("[BOOT] bypassing %s.xml parsing dependency",
+                         document)
+            elif state != PARSED:
                 log.warning("Document %r not parsed. "
                             "Waiting for the parsing to complete", document)
-                # Retry: when the document will be parsed
-                OCIDService().register(self.loop_check_document_parsing,
-                                       document_parsing=document)
-                break
+                pending.append(document)
+
+        self._pending_documents = ReadinessSet(
+            pending, callback=self._documents_parsed, name="documents")
+        # Wait for all the pending documents at once, each one is
+        # removed from the set when its parsing signal arrives.
+        for document in pending:
+            self.timeline.wait_for("document_parsing/%s" % document,
+                                   document)
+            callback = self._document_parsing_callback(document)
+            self._document_callbacks[document] = callback
+            ocid.register(callback, document_parsing=document)
+        # Documents parsed before their callback was registered.
+        self._pending_documents.refresh(self._is_document_parsed)
+
+    def _is_document_parsed(self, document):
+        return OCIDService().broker_document_state_dict.get(document) == PARSED
+
+    def _document_parsing_callback(self, document):
+        def _document_parsing(*args, **kwargs):
+            if not self._is_document_parsed(document):
+                return
+            log.info("[BOOT] document %r parsed", document)
+            self._unregister_document_callback(document)
+            self.timeline.end_wait("document_parsing/%s" % document)
+            self._pending_documents.mark_ready(document)
+        return _document_parsing
+
+    def _unregister_document_callback(self, document):
+        callback = self._document_callbacks.pop(document, None)
+        if callback is None:
+            return
+        try:
+            OCIDService().unregister(callback)
+        except ValueError:
+            log.debug("Callback not registered to document_parsing signal")
+
+    def _clear_document_callbacks(self):
+        if self._pending_documents is not None:
+            self._pending_documents.cancel()
+        for document in list(self._document_callbacks):
+            self.timeline.end_wait("document_parsing/%s" % document)
+            self._unregister_document_callback(document)
+
+    @traced_node
+    def _documents_parsed(self):
+        """Called once all the required documents are parsed."""
+        self._clear_document_callbacks()
+        # All documents are parsed, Open startup pages
+        # Check that the showcases for the default user have been
+        # retrieved
+        def _show_case_error_page():
+            log.error("Showcase not available, please reboot !")
+            self._drop_snapshot("showcase not available")
+            ErrorPage(title=_("STARTUP TIMEOUT ERROR"),
+                      description=_("Please restart."),
+                      error_message="Show cases not available").show()
+            self.hide_splashscreen()
+
+        showcase_status = BTAPIService().get_showcase_status()
+        log.info("get_showcase_status: %s", showcase_status)
+
+        if showcase_status == SHOW_CASE_OK.uid:
+            # Configure the UI and show the first pages
+            self._boot_checks_done(showcase_status)
+        elif showcase_status == SHOW_CASE_ON_GOING.uid:
+            # Wait while OCI is retrieving the showcases to continue
+            log.warning("Showcase status not available."
+                        "Waiting for the fetching to end.")
+            self.timeline.wait_for("_documents_parsed", "showcase")
+
+            def _show_ready_cb(show_case_ready):
+                log.info("showcase ready: %s", show_case_ready)
+                self.timeline.end_wait("_documents_parsed")
+                if not show_case_ready:
+                    _show_case_error_page()
+                else:
+                    try:
+                        BTAPIService().unregister(_show_ready_cb)
+                    except ValueError:
+                        log.debug("Callback not registered to "
+                                  " showcase_ready signal.")
+                    self._boot_checks_done(SHOW_CASE_OK.uid)
+
+            BTAPIService().register(_show_ready_cb,
+                                    showcase_ready="no_option")
         else:
-            # Try unregister the callback from the document_parsing signal
-            try:
-                OCIDService().unregister(self.loop_check_document_parsing)
-            except ValueError:
-                log.debug("Callback not registered to document_parsing signal")
-
-            # All documents are parsed, Open startup pages
-            # Check that the showcases for the default user have been
-            # retrieved
-            def _show_case_error_page():
-                log.error("Showcase not available, please reboot !")
-                ErrorPage(title=_("STARTUP TIMEOUT ERROR"),
-                          description=_("Please restart."),
-                          error_message="Show cases not available").show()
-                self.hide_splashscreen()
+            _show_case_error_page()
 
-            showcase_status = BTAPIService().get_showcase_status()
-            log.info("get_showcase_status: %s", showcase_status)
+    def _boot_checks_done(self, showcase_status):
+        """Finish the boot, or confirm the snapshot if the pages were
+        already built from it.
+        """
+        if self._snapshot_boot:
+            changed = self._snapshot_changes(showcase_status)
+            if not changed:
+                log.info("[BOOT] boot snapshot confirmed")
+                self.timeline.instant("snapshot_confirmed",
+                                      category="snapshot")
+                self._save_snapshot(showcase_status)
+                return
+            self._drop_snapshot("%s changed" % ", ".join(changed))
+        self._showcase_status = showcase_status
+        Task(self.finish).start()
+
+    def _boot_documents(self):
+        """Return the sorted names of the documents the boot waited for."""
+        return sorted(document for document
+                      in OCIDService().broker_document_state_dict
+                      if document not in BOOT_SKIPPED_DOCUMENTS)
+
+    def _snapshot_state(self, showcase_status):
+        update_status, assign_status = self._boot_status
+        return {
+            "is_migration": self.is_migration,
+            "update_status": update_status,
+            "assign_status": assign_status,
+            "showcase_status": showcase_status,
+            "documents": self._boot_documents(),
+        }
+
+    def _snapshot_changes(self, showcase_status):
+        """Return the names of the snapshot entries differing from the
+        state the boot checks just resolved."""
+        state = self._snapshot_state(showcase_status)
+        return sorted(key for key, value in state.iteritems()
+                      if self.snapshot.get(key) != value)
+
+    def _save_snapshot(self, showcase_status):
+        if (BOOT_SNAPSHOT_PATH is None or self._boot_status is None or
+                self.is_migration or self.first_page != 'main_hub' or
+                showcase_status != SHOW_CASE_OK.uid):
+            return
+        save_snapshot(BOOT_SNAPSHOT_PATH,
+                      self._snapshot_state(showcase_status))
 
-            if showcase_status == SHOW_CASE_OK.uid:
-                # Configure the UI and show the first pages
-                Task(self.finish).start()
-            elif showcase_status == SHOW_CASE_ON_GOING.uid:
-                # Wait while OCI is retrieving the showcases to continue
-                log.warning("Showcase status not available."
-                            "Waiting for the fetching to end.")
-
-                def _show_ready_cb(show_case_ready):
-                    log.info("showcase ready: %s", show_case_ready)
-                    if not show_case_ready:
-                        _show_case_error_page()
-                    else:
-                        try:
-                            BTAPIService().unregister(_show_ready_cb)
-                        except ValueError:
-                            log.debug("Callback not registered to "
-                                      " showcase_ready signal.")
-                        Task(self.finish).start()
-
-                BTAPIService().register(_show_ready_cb,
-                                        showcase_ready="no_option")
-            else:
-                _show_case_error_page()
+    def _drop_snapshot(self, reason):
+        """Invalidate the boot snapshot as a check disagrees with it.
+
+        If the pages were already built from it, start over from the
+        splash screen: the running checks resume the regular boot.
+        """
+        if self.snapshot is None:
+            return
+        invalidate_snapshot(BOOT_SNAPSHOT_PATH, reason)
+        self.timeline.instant("snapshot_invalidated", category="snapshot",
+                              reason=reason)
+        self.snapshot = None
+        if self._snapshot_boot:
+            self._snapshot_boot = False
+            # The regular boot runs finish again once its checks pass.
+            if self._finish_graph is not None:
+                self._finish_graph.cancel()
+            BasePlayer().stop()
+            for stack_name in wuk.application.stacks:
+                wuk.application.get_stack(stack_name).empty()
+            self.show_splashscreen()
 
     def _check_player_status(self):
         """Documents are already parsed at this stage.
@@ -455,17 +696,7 @@ class BootSequence(object):
         the middleware.
         """
         log.info("[BOOT] finish")
-        save_stb_name()
-
-        # Register the UI interface on dbus
-        try:
-            from leon_mal.services.dial import DIALNetworkObserver
-            DIALNetworkObserver().start()
-            from wydbus import WyDbus
-            WyDbus().request_name("com.wyplay.ui")
-            log.info("UI registered on dbus on com.wyplay.ui")
-        except Exception, e:
-            log.warning("Can't wait for UI dbus interface : %r", e)
+        self.timeline.begin("finish")
 
         # Try unregister the callback from the showcase_ready
         # signal
@@ -474,70 +705,51 @@ class BootSequence(object):
         except ValueError:
             log.debug("Callback not registered to showcase_ready signal.")
 
-        if self.save_pbu_lang:
-            set_config_language(self.save_pbu_lang, check='boot')
-            self.save_pbu_lang = None
-        else:
-            lang = get_config_language()
-            if lang != get_locale_language():
-                set_locale_language(lang)
-
-            # Workaround for defect #88563
-            # We are not sure why the audio language would not be the UI language,
-            # but it seems that it happens...
-            # This is a workaround to force mediarenderer to use the UI language.
-
-            def _set_audio_language_cb(request):
-                if request.is_failed():
-                    log.error("Set Audio Language Failed with error %s",
-                            request.return_code)
-                else:
-                    log.info("Set Audio Language Succeeded")
-
-            # Update the default audio language
-            audio_config = MediaRoot().get_service('audio_config')
-            audio_config.set_preferred_languages(
-                        priorities=[lang.iso2],
-                        callback=_set_audio_language_cb)
-
         if self.is_migration and self.first_page != "pin_code_change":
             # Software was migrated from Charles so we need to play
             # the setup wizard flow.
             self.first_page = 'pin_code_change'
 
-        # Here we know that subscriber_info is ready on OCI
-        # This will initialize the value of the _opt_status attribute.
-        OCIDService().init_opt_status()
-
-        self._init_iml()
+        # finish runs again when a dropped snapshot had already built
+        # the pages: only the steps are run again.
+        first_run = self._finish_graph is None
+        if not first_run:
+            self._finish_graph.cancel()
 
-        if os.getenv('TV', 'true').lower() not in ('false', '0', 'no'):
+        if first_run and os.getenv('TV', 'true').lower() not in (
+                'false', '0', 'no'):
             Task(self._check_player_status()).start(0.5, loop=True)
 
+        # Independent steps overlap, each one in its own main loop
+        # iteration. Only the process spawns run on worker threads: the
+        # D-Bus proxies and the services are not thread-safe.
+        graph = StepGraph("finish", callback=self._finished,
+                          timeline=self.timeline)
+        self._finish_graph = graph
+        graph.add("save_stb_name", save_stb_name)
+        graph.add("dial_observer", self._start_dial_observer)
+        graph.add("ui_dbus_name", self._request_ui_dbus_name)
+        graph.add("language", self._init_language)
+        # Here we know that subscriber_info is ready on OCI
+        # This will initialize the value of the _opt_status attribute.
+        graph.add("opt_status", OCIDService().init_opt_status)
+        graph.add("iml", self._init_iml)
         # Set poster servers now and on global install updates.
-        set_poster_servers()
-        OCIDService().register(set_poster_servers,
-                               document_parsing="GLOBALINSTALL")
-
+        graph.add("poster_servers", set_poster_servers)
         # Launch parental control manager singleton
-        ParentalControl()
+        graph.add("parental_control", ParentalControl)
+        graph.add("root_page", self._show_root_page,
+                  requires=("language", "opt_status", "iml",
+                            "poster_servers", "parental_control"))
+        graph.add("top_pages", self._show_top_pages, requires=("root_page",))
+        graph.add("netflix_hup", self._notify_netflix, threaded=True,
+                  requires=("top_pages",))
+        graph.run()
+
+        if first_run:
+            OCIDService().register(set_poster_servers,
+                                   document_parsing="GLOBALINSTALL")
 
-        # BOTTOM stack :
-        # Shows the root page
-        from adele_app.pages.root_page import RootPage
-        RootPage().show()
-
-        # TOP stack :
-        # Shows the clock
-        from adele_app.pages.common.clock import Clock
-        clock = Clock()
-        clock.show()  # keep splash screen visible
-        wuk.application.move_on_top(wuk.application.get('BootPage'))
-
-        # Shows the Pip, Keep clock visible
-        from adele_app.pages.tv.top_page_pip import Pip
-        Pip().show(keep_previous_visible=True, above=clock)
-        os.system('pkill -HUP netflix')
         # Connect to a signal that is called when the board is not
         # assigned. Run this code once
         if not self._is_signal_connected:
@@ -580,3 +792,103 @@ class BootSequence(object):
                         goto_firstinstall()
 
             OCIDService().register(on_unassign, boot_status_update='no_option')
+
+    def _start_dial_observer(self):
+        try:
+            from leon_mal.services.dial import DIALNetworkObserver
+            DIALNetworkObserver().start()
+        except Exception, e:
+            log.warning("Can't start DIAL network observer : %r", e)
+
+    def _request_ui_dbus_name(self):
+        # Register the UI interface on dbus
+        try:
+            from wydbus import WyDbus
+            WyDbus().request_name("com.wyplay.ui")
+            log.info("UI registered on dbus on com.wyplay.ui")
+        except Exception, e:
+            log.warning("Can't wait for UI dbus interface : %r", e)
+
+    def _init_language(self):
+        if self.save_pbu_lang:
+            set_config_language(self.save_pbu_lang, check='boot')
+            self.save_pbu_lang = None
+        else:
+            lang = get_config_language()
+            if lang != get_locale_language():
+                set_locale_language(lang)
+
+            # Workaround for defect #88563
+            # We are not sure why the audio language would not be the UI language,
+            # but it seems that it happens...
+            # This is a workaround to force mediarenderer to use the UI language.
+
+            def _set_audio_language_cb(request):
+                if request.is_failed():
+                    log.error("Set Audio Language Failed with error %s",
+                            request.return_code)
+                else:
+                    log.info("Set Audio Language Succeeded")
+
+            # Update the default audio language
+            audio_config = MediaRoot().get_service('audio_config')
+            audio_config.set_preferred_languages(
+                        priorities=[lang.iso2],
+                        callback=_set_audio_language_cb)
+
+    def _show_root_page(self):
+        # BOTTOM stack :
+        # Shows the root page
+        from adele_app.pages.root_page import RootPage
+        RootPage().show()
+
+    def _show_top_pages(self):
+        # TOP stack :
+        # Shows the clock
+        from adele_app.pages.common.clock import Clock
+        clock = Clock()
+        clock.show()  # keep splash screen visible
+        wuk.application.move_on_top(wuk.application.get('BootPage'))
+
+        # Shows the Pip, Keep clock visible
+        from adele_app.pages.tv.top_page_pip import Pip
+        Pip().show(keep_previous_visible=True, above=clock)
+
+    def _notify_netflix(self):
+        os.system('pkill -HUP netflix')
+
+    def _finished(self):
+        """Called once all the finish steps are done."""
+        if not self._finish_graph.succeeded:
+            # The pages may not be shown, do not boot from this state.
+            log.error("[BOOT] finish steps failed, no boot snapshot saved.")
+        elif not self._snapshot_boot:
+            self._save_snapshot(self._showcase_status)
+        self.timeline.end("finish")
+        self._dump_timeline()
+        if self._boot_done:
+            # Finished again after a dropped snapshot.
+            return
+        self._boot_done = True
+        # Lazy imports done during the boot, no more profiling needed.
+        profiler.write_report("boot")
+        profiler.uninstall()
+        # Warm the pages reached by the first key presses, the help
+        # browser first along with its webaccess entry.
+        PageRegistry().preload(HELP_PRELOAD_PAGES)
+        PageRegistry().preload()
+        WebaccessCache().prewarm(PREWARMED_WEBACCESS)
+        # Let the hotkeys resolve their channel without a browse.
+        ChannelIndex().build()
+        # Have the guide open against resident programmes.
+        EpgPrefetcher().schedule()
+
+    def _dump_timeline(self):
+        """Log the boot timeline summary and dump it if enabled."""
+        self.timeline.metadata["retry_stats"] = retry_stats()
+        worst = self.timeline.worst_wait()
+        log.info("[BOOT] done in %.3fs, longest wait: %s",
+                 self.timeline.now() - self.timeline.origin,
+                 "%s on %r (%.3fs)" % worst if worst else None)
+        if BOOT_TRACE_PATH is not None:
+            self.timeline.dump(BOOT_TRACE_PATH)
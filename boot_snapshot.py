@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Warm boot snapshot
+
+State resolved by the last complete boot (boot and software update
+statuses, parsed documents, showcase status...). When a valid snapshot
+is found, the boot sequence builds the pages right after the
+middleware is up while the regular checks run in the background to
+confirm it. A check disagreeing with the snapshot invalidates it.
+"""
+import json
+import os
+import time
+
+from peewee.debug import GET_LOGGER
+
+from leon_mal.platform import platform
+
+
+log = GET_LOGGER(__name__)
+
+SNAPSHOT_FORMAT = 2
+DEFAULT_SNAPSHOT_PATH = "/var/cache/nte/boot_snapshot.json"
+# Older snapshots are ignored even if their stamps match.
+SNAPSHOT_MAX_AGE = 7 * 24 * 3600
+
+
+def snapshot_path():
+    """Return the snapshot path set by ``BOOT_SNAPSHOT``, ``None`` if
+    disabled (default).
+
+    ``BOOT_SNAPSHOT=1`` uses :data:`DEFAULT_SNAPSHOT_PATH`, any other
+    value is used as the path.
+    """
+    value = os.getenv("BOOT_SNAPSHOT", "0")
+    if value.lower() in ("", "0", "n", "no", "false"):
+        return None
+    if value.lower() in ("1", "y", "yes", "true"):
+        return DEFAULT_SNAPSHOT_PATH
+    return value
+
+
+def _software_stamp():
+    # Installed application files are replaced by each software update.
+    # Stamp the source when shipped, __file__ may be the compiled file
+    # written on the box.
+    path = os.path.splitext(__file__)[0] + ".py"
+    if not os.path.exists(path):
+        path = __file__
+    stat = os.stat(path)
+    return "%d:%d:%d" % (stat.st_mtime, stat.st_size, stat.st_ino)
+
+
+def _stamps():
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "platform": platform,
+        "software": _software_stamp(),
+    }
+
+
+def load_snapshot(path):
+    """Return the snapshot state stored in ``path`` if it is still
+    valid, ``None`` otherwise.
+    """
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (IOError, OSError), e:
+        log.info("No boot snapshot: %r", e)
+        return None
+    except ValueError, e:
+        invalidate_snapshot(path, "unreadable snapshot (%r)" % e)
+        return None
+
+    stamps = _stamps()
+    for key, value in stamps.iteritems():
+        if snapshot.get(key) != value:
+            invalidate_snapshot(path, "%s changed: %r -> %r"
+                                % (key, snapshot.get(key), value))
+            return None
+    age = time.time() - snapshot.get("saved_at", 0)
+    if not 0 <= age <= SNAPSHOT_MAX_AGE:
+        invalidate_snapshot(path, "snapshot age is %ds" % age)
+        return None
+    log.info("Boot snapshot loaded from %r (%ds old).", path, age)
+    return snapshot.get("state")
+
+
+def save_snapshot(path, state):
+    snapshot = _stamps()
+    snapshot["saved_at"] = time.time()
+    snapshot["state"] = state
+    tmp_path = "%s.tmp" % path
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file, default=repr)
+        os.rename(tmp_path, path)
+    except (IOError, OSError, TypeError, ValueError), e:
+        log.warning("Cannot save boot snapshot to %r: %r", path, e)
+        return False
+    log.info("Boot snapshot saved to %r.", path)
+    return True
+
+
+def invalidate_snapshot(path, reason):
+    log.warning("Boot snapshot %r invalidated: %s", path, reason)
+    try:
+        os.remove(path)
+    except (IOError, OSError), e:
+        log.debug("Cannot remove boot snapshot %r: %r", path, e)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Channel search criteria
+
+Memoized channel search criteria, keyed on the channel id and the HD
+profile of the subscriber, with their predicate form to match the
+channels of the in-process channel index without the browse engine.
+The HD profile is read from ConfigMgmt once and read again when its
+configuration changes.
+"""
+from peewee.debug import GET_LOGGER
+from peewee.browse_criteria import Meta, And
+
+from leon_mal.configmgmt import ConfigMgmt
+
+
+log = GET_LOGGER(__name__)
+
+# ConfigMgmt keys the HD profile depends on.
+HD_CONFIG_KEYS = ("hd_interest", "hd_reception")
+# Criteria kept at most, the cache is emptied when it is reached.
+MAX_CACHED_CRITERIA = 256
+
+# (channel id, HD profile) -> criteria.
+_criteria = {}
+# HD profile read from ConfigMgmt, None until read or once changed.
+_hd_profile = None
+# Whether ConfigMgmt notifies the HD configuration changes, None until
+# registered.
+_hd_watched = None
+
+
+def _hd_config_changed(*args, **kwargs):
+    global _hd_profile
+    log.debug("HD configuration changed.")
+    _hd_profile = None
+
+
+def _watch_hd_config():
+    """Register to the HD configuration changes once, return whether
+    they are notified."""
+    global _hd_watched
+    if _hd_watched is None:
+        try:
+            config = ConfigMgmt()
+            for key in HD_CONFIG_KEYS:
+                config.register(_hd_config_changed, **{key: "no_option"})
+        except Exception, e:
+            log.warning("Cannot watch the HD configuration, it is read on "
+                        "each call: %r", e)
+            _hd_watched = False
+        else:
+            _hd_watched = True
+    return _hd_watched
+
+
+def is_hd_profile():
+    """Return whether HD channels can be proposed to the subscriber.
+
+    The value is cached until ConfigMgmt notifies a change of the HD
+    configuration. It is read on each call when the changes cannot be
+    watched.
+    """
+    global _hd_profile
+    # Registered before reading, so no change is missed.
+    watched = _watch_hd_config()
+    if _hd_profile is None or not watched:
+        config = ConfigMgmt()
+        _hd_profile = bool(config.get_hd_interest() and
+                           config.get_hd_reception())
+    return _hd_profile
+
+
+def get_channel_search_criteria(channel_id=None):
+    """Get channel search criteria.
+
+    Returns search criteria according to account subscription for
+    all channels or only one channel if 'channel_id' is specified.
+    """
+    hd_profile = is_hd_profile()
+    key = (channel_id, hd_profile)
+    try:
+        return _criteria[key]
+    except KeyError:
+        pass
+
+    search_criteria = [
+        Meta("valid_subscription") == True,
+    ]
+
+    if channel_id:
+        search_criteria.append(Meta("id") == channel_id)
+
+    if not hd_profile:
+        search_criteria.append(Meta("resolution") == "SD")
+
+    if len(_criteria) >= MAX_CACHED_CRITERIA:
+        _criteria.clear()
+    criteria = _criteria[key] = And(*search_criteria)
+    return criteria
+
+
+def channel_predicate(channel_id=None, hd_profile=None):
+    """Return a function telling whether a channel item matches the
+    :func:`get_channel_search_criteria` criteria.
+    """
+    if hd_profile is None:
+        hd_profile = is_hd_profile()
+
+    def _matches(channel):
+        if channel["valid_subscription"] != True:
+            return False
+        if channel_id and channel["id"] != channel_id:
+            return False
+        if not hd_profile and channel["resolution"] != "SD":
+            return False
+        return True
+
+    return _matches
+
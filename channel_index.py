@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Channel index
+
+In-process index of the channel list, by id and by LCN, so the hotkeys
+can resolve their target channel synchronously instead of opening a
+browse data source for a single channel. It is built once after the
+boot and merged again each time a channel list document is parsed: the
+merge only touches the channels which changed.
+
+Only the channels the hotkeys can zap to are kept: the subscribed
+channels for the DTV key and the radio channels for the radio key.
+"""
+import os
+
+from bisect import bisect_left, insort
+
+from peewee.browse_criteria import Meta
+from peewee.debug import GET_LOGGER
+from peewee.misc_utils import MetaSingleton
+
+from mal import MediaRoot
+
+from leon_mal.services.ocid import OCIDService
+
+from adele_app.facilities.channel_list_proxy import \
+    retrieve_all_radio_search_criteria
+
+
+log = GET_LOGGER(__name__)
+
+# Upper bound of the channels fetched for each list.
+MAX_CHANNELS = 2000
+# Broadcasted documents carrying the channel list and the subscriptions,
+# comma separated. When OCID knows none of them, the index is rebuilt
+# on every document.
+CHANNEL_DOCUMENTS = tuple(
+    os.getenv("CHANNEL_DOCUMENTS", "CHANNELS,SUBSCRIPTIONS").split(","))
+# Channel fields the lookups read: a channel is only counted as changed
+# when one of them changed.
+CHANNEL_FIELDS = ("lcn", "valid_subscription", "resolution")
+
+
+class ChannelEntry(object):
+
+    """Indexed channel: the browse item plus its lookup fields."""
+
+    __slots__ = ("item", "id", "lcn", "fields")
+
+    def __init__(self, item):
+        self.item = item
+        self.id = item["id"]
+        self.lcn = item["lcn"]
+        self.fields = tuple(item[field] for field in CHANNEL_FIELDS)
+
+
+class ChannelList(object):
+
+    """Channels by id and in LCN order."""
+
+    def __init__(self, name):
+        self.name = name
+        self._by_id = {}
+        #: Sorted (lcn, id) pairs.
+        self._by_lcn = []
+        self.ready = False
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def merge(self, items):
+        """Update the list with the complete channel list ``items``.
+
+        Only the added, removed and changed channels are touched.
+        Return the number of channels added, changed or removed.
+        """
+        entries = dict((entry.id, entry)
+                       for entry in (ChannelEntry(item) for item in items))
+        removed = [channel_id for channel_id in self._by_id
+                   if channel_id not in entries]
+        for channel_id in removed:
+            self._remove(channel_id)
+        changed = 0
+        for channel_id, entry in entries.iteritems():
+            current = self._by_id.get(channel_id)
+            if current is not None and current.lcn == entry.lcn:
+                # Keep LCN order, hold the item just fetched.
+                self._by_id[channel_id] = entry
+                if current.fields != entry.fields:
+                    changed += 1
+                continue
+            if current is not None:
+                self._remove(channel_id)
+            self._by_id[channel_id] = entry
+            insort(self._by_lcn, (entry.lcn, channel_id))
+            changed += 1
+        self.ready = True
+        log.info("Channel index %s: %d channels (%d added or changed, "
+                 "%d removed)", self.name, len(self._by_id), changed,
+                 len(removed))
+        return changed + len(removed)
+
+    def _remove(self, channel_id):
+        entry = self._by_id.pop(channel_id)
+        self._by_lcn.remove((entry.lcn, channel_id))
+
+    def get(self, channel_id):
+        entry = self._by_id.get(channel_id)
+        return entry.item if entry is not None else None
+
+    def get_by_lcn(self, lcn):
+        index = bisect_left(self._by_lcn, (lcn,))
+        if index < len(self._by_lcn) and self._by_lcn[index][0] == lcn:
+            return self._by_id[self._by_lcn[index][1]].item
+        return None
+
+    def neighbours(self, channel_id, count):
+        """Return the ids of the ``count`` channels before and after
+        ``channel_id`` in LCN order, closest first."""
+        entry = self._by_id.get(channel_id)
+        if entry is None:
+            return []
+        index = bisect_left(self._by_lcn, (entry.lcn, channel_id))
+        neighbours = []
+        for distance in xrange(1, count + 1):
+            for position in (index + distance, index - distance):
+                if 0 <= position < len(self._by_lcn):
+                    neighbours.append(self._by_lcn[position][1])
+        return neighbours
+
+    def entries(self):
+        """Iterate over the channels in LCN order."""
+        by_id = self._by_id
+        for lcn, channel_id in self._by_lcn:
+            yield by_id[channel_id]
+
+    def find(self, channel_id=None, predicate=None):
+        """Return the first channel in LCN order, or ``channel_id``,
+        for which ``predicate(item)`` is true.
+
+        Return ``None`` when the list is not built yet or no channel
+        matches: callers must then fall back on a browse.
+        """
+        if not self.ready:
+            return None
+        if channel_id:
+            entry = self._by_id.get(channel_id)
+            if entry is not None and (predicate is None or
+                                      predicate(entry.item)):
+                return entry.item
+            return None
+        for entry in self.entries():
+            if predicate is None or predicate(entry.item):
+                return entry.item
+        return None
+
+
+class ChannelIndex(object):
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self):
+        #: Subscribed channels, the DTV key candidates.
+        self.channels = ChannelList("channels")
+        #: Radio channels, as browsed by the radio key.
+        self.radios = ChannelList("radios")
+        # Browses in flight.
+        self._building = 0
+        # A document was parsed during the build, build again.
+        self._stale = False
+        self._listeners = []
+        self._documents_registered = []
+
+    @property
+    def ready(self):
+        return self.channels.ready
+
+    def build(self):
+        """Fetch the channel lists and merge them into the index."""
+        if self._building:
+            self._stale = True
+            return
+        self._stale = False
+        self._register_documents()
+        self._building = 2
+        self._browse(self.channels, Meta("valid_subscription") == True)
+        self._browse(self.radios, retrieve_all_radio_search_criteria())
+
+    def _browse(self, channels, criteria):
+        def _browse_cb(request):
+            request.caller.close()
+            self._build_cb(channels, request)
+
+        datasource = MediaRoot().get_container("channel").browse(
+            metadata="all", search_criteria=criteria, order="+lcn",
+            max_hits=MAX_CHANNELS, static=True)
+        datasource.get(count=MAX_CHANNELS, callback=_browse_cb)
+
+    def _register_documents(self):
+        ocid = OCIDService()
+        documents = [document for document in CHANNEL_DOCUMENTS
+                     if document in ocid.broker_document_state_dict]
+        if not documents:
+            documents = list(ocid.broker_document_state_dict)
+            if not self._documents_registered:
+                log.warning("No channel list document among %r, the "
+                            "channel index is updated on every document.",
+                            documents)
+        for document in documents:
+            if document not in self._documents_registered:
+                self._documents_registered.append(document)
+                ocid.register(self._document_parsed,
+                              document_parsing=document)
+
+    def _document_parsed(self, *args, **kwargs):
+        log.info("Channel list document parsed, updating channel index.")
+        self.build()
+
+    def _build_cb(self, channels, request):
+        self._building -= 1
+        changed = 0
+        if not request.is_succeeded():
+            log.error("Cannot build channel index %s: %r", channels.name,
+                      request)
+        else:
+            changed = channels.merge(request.data["result"])
+        if changed:
+            for listener in list(self._listeners):
+                listener()
+        if self._stale and not self._building:
+            self.build()
+
+    def register(self, listener):
+        """Call ``listener()`` each time a channel list changes."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def unregister(self, listener):
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            log.debug("Listener %r not registered.", listener)
+
+    def find(self, channel_id=None, predicate=None):
+        """Return the subscribed channel ``channel_id``, or the first one
+        in LCN order, matching ``predicate``, see
+        :func:`adele_app.channel_criteria.channel_predicate`.
+
+        Return ``None`` when the index is not built yet or no channel
+        matches: callers must then fall back on a browse.
+        """
+        return self.channels.find(channel_id, predicate)
+
+    def neighbours(self, channel_id, count):
+        """Return the ids of the ``count`` channels before and after
+        ``channel_id`` in LCN order, in its own list (subscribed or
+        radio channels)."""
+        if channel_id in self.radios._by_id:
+            return self.radios.neighbours(channel_id, count)
+        return self.channels.neighbours(channel_id, count)
+
+    def find_radio(self, channel_id=None):
+        """Return the radio channel ``channel_id``, or the first one in
+        LCN order, ``None`` when not found or the index is not built."""
+        return self.radios.find(channel_id)
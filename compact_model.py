@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Compact channel and programme model
+
+Browse items carry every metadata of a record in a dict-like object. The
+classes below keep only the fields the UI reads, in ``__slots__``
+records for channels and in a struct-of-arrays table for programmes,
+with the repeated strings (ids, titles, genres) shared. Strings are
+shared per channel list or per programme table channel, so they are
+freed along with it.
+
+Memory benchmark on a synthetic dataset::
+
+    python compact_model.py [CHANNELS [PROGRAMMES]]
+"""
+import sys
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+def intern_string(strings, value):
+    """Return the instance of ``value`` (str or unicode) shared in the
+    ``strings`` dict, ``value`` itself if ``strings`` is ``None``."""
+    if value is None or strings is None:
+        return value
+    return strings.setdefault(value, value)
+
+
+class Channel(object):
+
+    __slots__ = ("id", "lcn", "name", "resolution", "subscribed", "logo")
+
+    def __init__(self, id, lcn, name, resolution, subscribed, logo=None,
+                 strings=None):
+        self.id = intern_string(strings, id)
+        self.lcn = lcn
+        self.name = intern_string(strings, name)
+        self.resolution = intern_string(strings, resolution)
+        self.subscribed = subscribed
+        self.logo = intern_string(strings, logo)
+
+    @classmethod
+    def from_item(cls, item, strings=None):
+        return cls(item["id"], item["lcn"], item["title"],
+                   item["resolution"], bool(item["valid_subscription"]),
+                   item.get("logo"), strings)
+
+    def __repr__(self):
+        return "<Channel %s %r>" % (self.lcn, self.name)
+
+
+class Programme(object):
+
+    __slots__ = ("id", "channel_id", "start_time", "end_time", "title",
+                 "genre")
+
+    def __init__(self, id, channel_id, start_time, end_time, title,
+                 genre=None):
+        self.id = id
+        self.channel_id = channel_id
+        self.start_time = start_time
+        self.end_time = end_time
+        self.title = title
+        self.genre = genre
+
+    @classmethod
+    def from_item(cls, item, strings=None):
+        return cls(item["id"], intern_string(strings, item["channel_id"]),
+                   item["start_time"], item["end_time"],
+                   intern_string(strings, item["title"]),
+                   intern_string(strings, item.get("genre")))
+
+    def __repr__(self):
+        return "<Programme %s %r>" % (self.start_time, self.title)
+
+
+class ChannelProgrammes(object):
+
+    """Programme columns of one channel, sorted by start time."""
+
+    __slots__ = ("channel_id", "strings", "ids", "start_times", "end_times",
+                 "titles", "genres", "max_duration")
+
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+        #: Shared strings of the channel, freed along with it.
+        self.strings = {}
+        self.ids = []
+        self.start_times = array("d")
+        self.end_times = array("d")
+        self.titles = []
+        self.genres = []
+        #: Longest programme, bounds the backward search of between().
+        self.max_duration = 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, index):
+        return Programme(self.ids[index], self.channel_id,
+                         self.start_times[index], self.end_times[index],
+                         self.titles[index], self.genres[index])
+
+    def insert(self, id, start_time, end_time, title, genre=None):
+        """Add a programme, in start time order: appending in order is
+        the fast path."""
+        index = len(self.ids)
+        if index and start_time < self.start_times[-1]:
+            index = bisect_right(self.start_times, start_time)
+        strings = self.strings
+        self.ids.insert(index, id)
+        self.start_times.insert(index, start_time)
+        self.end_times.insert(index, end_time)
+        self.titles.insert(index, intern_string(strings, title))
+        self.genres.insert(index, intern_string(strings, genre))
+        self.max_duration = max(self.max_duration, end_time - start_time)
+
+    def between(self, start, end):
+        """Return the programmes overlapping ``[start, end)``."""
+        # Programmes starting before start - max_duration ended before
+        # start, the ones left may still overlap each other.
+        first = bisect_right(self.start_times, start - self.max_duration)
+        last = bisect_left(self.start_times, end)
+        end_times = self.end_times
+        return [self.row(index) for index in xrange(first, last)
+                if end_times[index] > start]
+
+
+class ProgrammeTable(object):
+
+    """Programmes stored column by column, per channel.
+
+    Each channel keeps its programmes sorted by start time in
+    :class:`ChannelProgrammes` columns: times in ``array('d')``, the
+    other columns in lists of strings shared within the channel. Rows
+    are read as :class:`Programme`.
+    """
+
+    def __init__(self):
+        #: Channel id -> ChannelProgrammes.
+        self.channels = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for channel_id in sorted(self.channels):
+            channel = self.channels[channel_id]
+            for index in xrange(len(channel)):
+                yield channel.row(index)
+
+    def append(self, id, channel_id, start_time, end_time, title,
+               genre=None):
+        """Add a programme, preferably in start time order within its
+        channel."""
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = ChannelProgrammes(
+                channel_id)
+        channel.insert(id, start_time, end_time, title, genre)
+        self._size += 1
+
+    def append_item(self, item):
+        self.append(item["id"], item["channel_id"], item["start_time"],
+                    item["end_time"], item["title"], item.get("genre"))
+
+    def remove_channel(self, channel_id):
+        """Drop the programmes of ``channel_id``, return how many."""
+        channel = self.channels.pop(channel_id, None)
+        if channel is None:
+            return 0
+        self._size -= len(channel)
+        return len(channel)
+
+    def between(self, start, end, channel_id=None):
+        """Return the programmes overlapping ``[start, end)``, of
+        ``channel_id`` only if set, sorted by start time."""
+        if channel_id is not None:
+            channel = self.channels.get(channel_id)
+            return channel.between(start, end) if channel is not None else []
+        programmes = []
+        for channel in self.channels.itervalues():
+            programmes.extend(channel.between(start, end))
+        programmes.sort(key=lambda programme: (programme.start_time,
+                                               programme.channel_id))
+        return programmes
+
+
+def channels_from_items(items):
+    """Convert channel browse items to :class:`Channel` records."""
+    strings = {}
+    return [Channel.from_item(item, strings) for item in items]
+
+
+def programmes_from_items(items):
+    """Convert programme browse items, preferably sorted by start time,
+    to a :class:`ProgrammeTable`."""
+    table = ProgrammeTable()
+    for item in items:
+        table.append_item(item)
+    return table
+
+
+def _deep_size(root):
+    """Return the approximate size in bytes of ``root`` and what it
+    references."""
+    seen = set()
+    size = 0
+    stack = [root]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            stack.extend(value.iterkeys())
+            stack.extend(value.itervalues())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            stack.extend(value)
+        elif hasattr(value, "__slots__"):
+            stack.extend(getattr(value, slot) for slot in value.__slots__
+                         if hasattr(value, slot))
+        elif isinstance(value, ProgrammeTable):
+            stack.extend(value.__dict__.itervalues())
+    return size
+
+
+def _synthetic_items(channels, programmes):
+    """Return browse-like channel and programme dicts."""
+    genres = [u"News", u"Movie", u"Sport", u"Kids", u"Series", u"Music"]
+    channel_items = [{
+        "id": u"channel_%d" % index,
+        "lcn": index + 1,
+        "title": u"Channel %d" % (index + 1),
+        "resolution": u"HD" if index % 3 else u"SD",
+        "valid_subscription": index % 5 != 0,
+        "logo": u"http://logos/channel_%d.png" % index,
+        "type": u"channel",
+        "description": u"",
+    } for index in xrange(channels)]
+    per_channel = max(1, programmes // channels)
+    programme_items = []
+    for channel in channel_items:
+        start = 1500000000.0
+        for index in xrange(per_channel):
+            programme_items.append({
+                "id": u"%s_%d" % (channel["id"], index),
+                # Separate string instances, as decoded from D-Bus.
+                "channel_id": u"%s" % channel["id"],
+                "start_time": start,
+                "end_time": start + 1800.0,
+                "title": u"Programme title %d" % (index % 40),
+                "genre": u"%s" % genres[index % len(genres)],
+                "type": u"program",
+                "description": u"",
+            })
+            start += 1800.0
+    return channel_items, programme_items
+
+
+def benchmark(channels=1000, programmes=100000):
+    """Compare the browse items with the compact model, return a dict
+    of approximate sizes in bytes."""
+    channel_items, programme_items = _synthetic_items(channels, programmes)
+    compact_channels = channels_from_items(channel_items)
+    strings = {}
+    records = [Programme.from_item(item, strings)
+               for item in programme_items]
+    table = programmes_from_items(programme_items)
+    return {
+        "channel_items": _deep_size(channel_items),
+        "channel_records": _deep_size(compact_channels),
+        "programme_items": _deep_size(programme_items),
+        "programme_records": _deep_size(records),
+        "programme_table": _deep_size(table),
+    }
+
+
+if __name__ == "__main__":
+    sizes = benchmark(*[int(arg) for arg in sys.argv[1:3]])
+    print "%-20s %12s" % ("", "bytes")
+    for name in sorted(sizes):
+        print "%-20s %12d" % (name, sizes[name])
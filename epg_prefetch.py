@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+EPG prefetch
+
+Keep the programmes of a rolling window around the current channel and
+its LCN neighbours in memory, so the guide opens against resident data.
+The prefetch runs after the boot and on each hotkey zap, one channel
+browse at a time during idle frames. The programmes are held in a
+:class:`adele_app.compact_model.ProgrammeTable`, capped in programmes:
+the least recently used channels are evicted first.
+"""
+import time
+
+from collections import OrderedDict
+
+from peewee.browse_criteria import Meta, And
+from peewee.debug import GET_LOGGER
+from peewee.misc_utils import MetaSingleton
+from peewee.notifier import Task
+
+from mal import MediaRoot
+
+from adele_app.channel_index import ChannelIndex
+from adele_app.compact_model import ProgrammeTable
+
+
+log = GET_LOGGER(__name__)
+
+# Seconds prefetched before and after now.
+EPG_WINDOW = 3 * 3600
+# Seconds fetched beyond the window end, so it stays covered a while.
+EPG_WINDOW_MARGIN = EPG_WINDOW / 6
+# Channels prefetched on each side of the current one, in LCN order.
+NEIGHBOUR_CHANNELS = 2
+# Programmes kept at most in the store.
+MAX_PROGRAMMES = 3000
+# Upper bound of the programmes fetched for one channel window.
+MAX_CHANNEL_PROGRAMMES = 200
+# Seconds between two channel browses.
+PREFETCH_PERIOD = 0.2
+PROGRAM_CONTAINER = "program"
+
+
+class EpgStore(object):
+
+    """Programme windows by channel, least recently used channel first."""
+
+    def __init__(self, max_programmes=MAX_PROGRAMMES):
+        self.max_programmes = max_programmes
+        self.table = ProgrammeTable()
+        #: Channel id -> (window start, window end), in LRU order.
+        self._windows = OrderedDict()
+
+    def __len__(self):
+        return len(self.table)
+
+    def covers(self, channel_id, start, end):
+        window = self._windows.get(channel_id)
+        return window is not None and window[0] <= start and end <= window[1]
+
+    def get(self, channel_id, start, end):
+        """Return the programmes of ``channel_id`` overlapping ``[start,
+        end)``, as :class:`adele_app.compact_model.Programme`, ``None``
+        if this window is not resident."""
+        if not self.covers(channel_id, start, end):
+            return None
+        self._windows[channel_id] = self._windows.pop(channel_id)
+        return self.table.between(start, end, channel_id)
+
+    def put(self, channel_id, start, end, items):
+        """Replace the window of ``channel_id`` with the programme browse
+        ``items``."""
+        self.table.remove_channel(channel_id)
+        self._windows.pop(channel_id, None)
+        for item in items:
+            self.table.append(item["id"], channel_id, item["start_time"],
+                              item["end_time"], item["title"],
+                              item.get("genre"))
+        self._windows[channel_id] = (start, end)
+        while (len(self.table) > self.max_programmes and
+               len(self._windows) > 1):
+            evicted_id = self._windows.popitem(last=False)[0]
+            self.table.remove_channel(evicted_id)
+            log.debug("EPG store full, evicted channel %s.", evicted_id)
+
+    def clear(self):
+        self.table = ProgrammeTable()
+        self._windows.clear()
+
+
+class EpgPrefetcher(object):
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self):
+        self.store = EpgStore()
+        self._queue = []
+        self._fetching = False
+
+    def schedule(self, channel=None):
+        """Prefetch the window of ``channel`` (the current channel by
+        default) and its neighbours, replacing the previous queue."""
+        if channel is None:
+            from leon_mal.player import TVPlayer
+            channel = TVPlayer().current_channel
+            if channel is None:
+                return
+        channel_id = channel["id"]
+        index = ChannelIndex()
+        if not index.ready:
+            # Add the neighbours once the channel list is known.
+            index.register(self._channel_list_ready)
+        self._queue = [channel_id] + index.neighbours(channel_id,
+                                                      NEIGHBOUR_CHANNELS)
+        if not self._fetching:
+            self._fetching = True
+            Task(self._fetch_next).start(consider_idle=True)
+
+    def _channel_list_ready(self):
+        ChannelIndex().unregister(self._channel_list_ready)
+        self.schedule()
+
+    def get_programmes(self, channel_id, start, end):
+        """Return the resident programmes of ``channel_id`` overlapping
+        ``[start, end)``, ``None`` when they must be browsed."""
+        return self.store.get(channel_id, start, end)
+
+    def _window(self):
+        now = time.time()
+        return now - EPG_WINDOW, now + EPG_WINDOW
+
+    def _fetch_next(self):
+        start, end = self._window()
+        while self._queue:
+            channel_id = self._queue.pop(0)
+            if not self.store.covers(channel_id, start, end):
+                self._fetch(channel_id, start, end + EPG_WINDOW_MARGIN)
+                return
+        self._fetching = False
+
+    def _fetch(self, channel_id, start, end):
+        criteria = And(Meta("channel_id") == channel_id,
+                       Meta("end_time") > start,
+                       Meta("start_time") < end)
+        datasource = MediaRoot().get_container(PROGRAM_CONTAINER).browse(
+            metadata="all", search_criteria=criteria,
+            order="+start_time", max_hits=MAX_CHANNEL_PROGRAMMES,
+            static=True)
+        datasource.get(count=MAX_CHANNEL_PROGRAMMES, callback=self._fetched,
+                       args=(channel_id, start, end))
+
+    def _fetched(self, request):
+        request.caller.close()
+        channel_id, start, end = request.args
+        if request.is_succeeded():
+            self.store.put(channel_id, start, end, request.data["result"])
+        else:
+            log.warning("Cannot prefetch EPG of channel %s: %r", channel_id,
+                        request)
+        Task(self._fetch_next).start(init_delay=PREFETCH_PERIOD,
+                                     consider_idle=True)
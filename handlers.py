@@ -2,15 +2,17 @@
 from mal import MediaRoot
 from peewee.debug import GET_LOGGER
 from peewee.browse_criteria import Meta, And
+from peewee.notifier import Task
 import wuk
 from wuk.pages import key_handlers
 from wuk.pages.stack_utils import PageNotFoundError
 
 from com.leon.avr import AVR
 
+from leon_app_tools.fpdisplay_tools import FrontPanelTools
+
 from leon_mal.player import BasePlayer
 from leon_mal.platform import get_platform
-from leon_mal.configmgmt import ConfigMgmt
 from leon_mal.userconfigmgmt import UserConfigMgmt
 
 from adele_app.background import scroll_bg_lines
@@ -18,6 +20,15 @@ from adele_app.facilities.cutv import CUTV_INACTIVITY, cutv_inactivity_task
 from adele_app.facilities.cutv import cutv_exit_notification
 from adele_app.facilities.main_hub import back_to_home
 from adele_app.facilities.channel_list_proxy import retrieve_all_radio_search_criteria
+from adele_app.navigation import NavigationBatch
+from adele_app.key_latency import KeyLatency, current_span
+from adele_app.page_registry import get_page_class
+from adele_app.webaccess_cache import WebaccessCache
+from adele_app.channel_index import ChannelIndex
+from adele_app.epg_prefetch import EpgPrefetcher
+from adele_app.zap_pipeline import ZapPipeline
+from adele_app.channel_criteria import (get_channel_search_criteria,
+                                        channel_predicate)
 
 import time
 
@@ -26,38 +37,51 @@ log = GET_LOGGER(__name__)
 
 v4_platform = get_platform() == "v4"
 
+# Minimum delay between two front panel blinks, or two CUTV inactivity
+# timer restarts (about one frame): auto-repeat bursts trigger them once.
+KEY_SIDE_EFFECTS_PERIOD = 0.04
+# Maximum number of moves merged while a selection is in progress,
+# older key presses are dropped when the list can not keep up.
+MAX_COALESCED_MOVES = 10
+# Seconds after which a selection which did not call back is given up,
+# so the keys merged meanwhile are not blocked for good.
+NAVIGATION_TIMEOUT = 1.0
+
+# Side effect name -> time it last ran.
+_last_key_side_effects = {}
+
+
+def _add_span(spans, span):
+    """Return ``spans`` plus ``span``, closing the oldest spans beyond
+    MAX_COALESCED_MOVES: their key presses are dropped anyway."""
+    spans += (span,)
+    for dropped in spans[:-MAX_COALESCED_MOVES]:
+        dropped.close_after_update()
+    return spans[-MAX_COALESCED_MOVES:]
+
+
+def _key_side_effect_due(name):
+    """Return whether the key side effect ``name`` must run for this
+    event. Each side effect is throttled on its own: a throttled one
+    does not hold back the others."""
+    now = time.time()
+    last = _last_key_side_effects.get(name, 0.0)
+    if now - last < KEY_SIDE_EFFECTS_PERIOD:
+        return False
+    _last_key_side_effects[name] = now
+    return True
+
 
 def show_helparea(helparea):
-    from adele_app.facilities.iml_utils import get_webaccess, launch_iml
+    from adele_app.facilities.iml_utils import launch_iml
 
-    def _help_entry(request):
-        if request.is_succeeded():
-            svc = request.data["result"]
+    def _help_entry(svc):
+        if svc is not None:
             launch_iml(svc, html_meta_name="target_html",
                        iml_meta_name="target",
                        parameters={'helparea': helparea})
-        else:
-            log.error("Cannot get help element from webaccess")
-    get_webaccess("HELP", callback=_help_entry)
-
-def get_channel_search_criteria(channel_id=None):
-    """Get channel search criteria.
-
-    Returns search criteria according to account subscription for
-    all channels or only one channel if 'channel_id' is specified.
-    """
-    search_criteria = [
-        Meta("valid_subscription") == True,
-    ]
-
-    if channel_id:
-        search_criteria.append(Meta("id") == channel_id)
-    profile_hd = ConfigMgmt().get_hd_interest() and ConfigMgmt().get_hd_reception()
+    WebaccessCache().resolve("HELP", callback=_help_entry)
 
-    if not profile_hd:
-        search_criteria.append(Meta("resolution") == "SD")
-
-    return And(*search_criteria)
 
 class BaseEventHandler(key_handlers.BaseEventHandler):
 
@@ -72,25 +96,40 @@ class BaseEventHandler(key_handlers.BaseEventHandler):
     if v4_platform:
         def __call__(self, event):
             log.info("[event/handler] %s / %s", event, self)
+            span = KeyLatency().begin(self, event)
             self._blink(event)
-            cutv_inactivity_task.start(CUTV_INACTIVITY)
+            if _key_side_effect_due("cutv_inactivity"):
+                cutv_inactivity_task.start(CUTV_INACTIVITY)
             if "ready" not in self.page.view_states:
                 log.info("Page not ready, dropping key.")
+                span.cancel()
                 return True
-            return super(BaseEventHandler, self).__call__(event)
+            try:
+                return super(BaseEventHandler, self).__call__(event)
+            finally:
+                KeyLatency().end(span)
 
         def _blink(self, event):
-            if not (str(event).lower()).startswith("short"):
+            # Throttled after the short press test: short events must not
+            # use up the blink of the event following them.
+            if (not (str(event).lower()).startswith("short") and
+                    _key_side_effect_due("blink")):
                 # Front Panel: set Power Led blink
                 FrontPanelTools().set_power_led_blink()
     else:
         def __call__(self, event):
             log.info("[event/handler] %s / %s", event, self)
-            cutv_inactivity_task.start(CUTV_INACTIVITY)
+            span = KeyLatency().begin(self, event)
+            if _key_side_effect_due("cutv_inactivity"):
+                cutv_inactivity_task.start(CUTV_INACTIVITY)
             if "ready" not in self.page.view_states:
                 log.info("Page not ready, dropping key.")
+                span.cancel()
                 return True
-            return super(BaseEventHandler, self).__call__(event)
+            try:
+                return super(BaseEventHandler, self).__call__(event)
+            finally:
+                KeyLatency().end(span)
 
     def event_back(self, event):
         self.page.hide()
@@ -157,18 +196,20 @@ class BaseEventHandler(key_handlers.BaseEventHandler):
 
         if not indirect:
             AVR().send("HOTKEY", "digitaltv")
+        # Only the last zap key is honoured.
+        ZapPipeline.cancel_current()
 
-        from adele_app.pages.tv.tv_page import TVPage
+        TVPage = get_page_class("TVPage")
         from leon_mal.player import TVPlayer
         from leon_mal.radio import is_radio_channel
-        from adele_app.pages.player.media_player_page import MediaPlayerPage
+        MediaPlayerPage = get_page_class("MediaPlayerPage")
 
         # Jira Bug STBV4V5-1176
         from leon_mal.userconfigmgmt import UserConfigMgmt
-        from adele_app.pages.player.demo_page import DemoVideoPage
-        from adele_app.pages.netflix.netflix_page import NetflixPage
+        DemoVideoPage = get_page_class("DemoVideoPage")
+        NetflixPage = get_page_class("NetflixPage")
         # Jira Bug STBV4V5-1563,1568
-        from adele_app.pages.iml.html import ImlBrowserPage
+        ImlBrowserPage = get_page_class("ImlBrowserPage")
 
         try:
             top_page = wuk.application.get_stack("main")[-1]
@@ -217,74 +258,102 @@ class BaseEventHandler(key_handlers.BaseEventHandler):
                 main_hub.focus_tv(instant_anim=True)
 
         else:
-            def _play_channel_cb(request):
-                request.caller.close()
-                if self.page.requests is not None and request in self.page.requests:
-                    self.page.requests.remove(request)
-                if not request.is_succeeded():
-                    log.error("Could not get tv channel: %r", request)
-                else:
-                    tv_channel = request.data['result'][0]
+            def _prepare_tv_page():
+                """Build the TV page if it is not in the stack, without
+                showing it, and open the renderer connection."""
+                BasePlayer().get_renderer_connection()
+                if "TVPage" in wuk.application:
+                    return None
+                return TVPage()
+
+            def _zap(tv_channel, new_tv_page=None):
+                def _cb_to_live(request):
+                    if request.is_failed():
+                        log.error("Could not go go back to Live")
+                    else:
+                        log.info("Could go back to live")
+                    tv_page.back_to_tv()
 
-                    def _cb_to_live(request):
-                        if request.is_failed():
-                            log.error("Could not go go back to Live")
-                        else:
-                            log.info("Could go back to live")
-                        tv_page.back_to_tv()
+                main_hub = wuk.application.get('MainHub')
+                tv_page_on_top = False
+                # Get/create TVPage
+                try:
+                    tv_page = wuk.application.get('TVPage')
+                    tv_page_on_top = True
+                    log.info("TV Page found in the stack")
+                    tv_page._info_page_shown = False
+                    tv_page.zap_with_asset(channel=tv_channel)
+                    # Application.move_on_top(tv_page)   #should be included with data layer removal v2, but TV trick player has graphical bugs with this
+                except PageNotFoundError:
+                    # Shown only now that the channel is known.
+                    tv_page = new_tv_page or TVPage()
+                    log.info("TV Page not found in the stack")
 
-                    main_hub = wuk.application.get('MainHub')
-                    tv_page_on_top = False
-                    # Get/create TVPage
-                    try:
-                        tv_page = wuk.application.get('TVPage')
-                        tv_page_on_top = True
-                        log.info("TV Page found in the stack")
-                        tv_page._info_page_shown = False
-                        tv_page.zap_with_asset(channel=tv_channel)
-                        # Application.move_on_top(tv_page)   #should be included with data layer removal v2, but TV trick player has graphical bugs with this
-                    except PageNotFoundError:
-                        tv_page = TVPage()
-                        log.info("TV Page not found in the stack")
-
-                        tv_page.show(above=main_hub, ignore_banner=show_banner, channel=tv_channel)
+                    tv_page.show(above=main_hub, ignore_banner=show_banner, channel=tv_channel)
+                    tv_page.back_to_tv()
+                    tv_page.zap_with_asset(channel=tv_channel)
+                # Focus television on the main hub, for when we go back from fullscreen TV
+                if tv_page_on_top:
+                    if tv_page.is_playing_live:
                         tv_page.back_to_tv()
-                        tv_page.zap_with_asset(channel=tv_channel)
-                    # Focus television on the main hub, for when we go back from fullscreen TV
-                    if tv_page_on_top:
-                        if tv_page.is_playing_live:
-                            tv_page.back_to_tv()
-                        else:
-                            TVPlayer().play_live(callback=_cb_to_live)
-                        main_hub.focus_tv(instant_anim=True)
+                    else:
+                        TVPlayer().play_live(callback=_cb_to_live)
+                    main_hub.focus_tv(instant_anim=True)
+                EpgPrefetcher().schedule(tv_channel)
+
+            def _resolve_channel(callback):
+                def _play_channel_cb(request):
+                    request.caller.close()
+                    if self.page.requests is not None and request in self.page.requests:
+                        self.page.requests.remove(request)
+                    if not request.is_succeeded():
+                        log.error("Could not get tv channel: %r", request)
+                        callback(None)
+                    else:
+                        callback(request.data['result'][0])
+
+                last_tuned_channel_criteria = get_channel_search_criteria(
+                        channel_id=last_tuned_channel_id)
+                datasource = MediaRoot().get_container("channel").browse(
+                    metadata="all",
+                    search_criteria=last_tuned_channel_criteria,
+                    order="+lcn",
+                    max_hits=1,
+                    static=True)
+                datasource.get(count=1,
+                               callback=_play_channel_cb)
 
             last_tuned_channel_id = UserConfigMgmt()["last_tuned_radio"]['channel']
-            last_tuned_channel_criteria = get_channel_search_criteria(
-                    channel_id=last_tuned_channel_id)
-            datasource = MediaRoot().get_container("channel").browse(
-                metadata="all",
-                search_criteria=last_tuned_channel_criteria,
-                order="+lcn",
-                max_hits=1,
-                static=True)
-            datasource.get(count=1,
-                           callback=_play_channel_cb)
+            # Resolve the channel from the channel index, browse only if
+            # it is not built yet.
+            tv_channel = ChannelIndex().find(channel_id=last_tuned_channel_id,
+                                             predicate=channel_predicate())
+            if tv_channel is not None:
+                _zap(tv_channel)
+                return True
+            # Build the TV page while the channel is browsed, it is only
+            # shown once the channel is known.
+            span = current_span().defer()
+            ZapPipeline(_resolve_channel, _prepare_tv_page, _zap,
+                        callback=lambda zapped: span.close_after_update()
+                        ).start()
         return True
 
     @cutv_exit_notification
     def event_radio(self, event):
         AVR().send("HOTKEY", "radio")
+        ZapPipeline.cancel_current()
 
-        from adele_app.pages.tv.tv_page import TVPage
+        TVPage = get_page_class("TVPage")
         from leon_mal.player import TVPlayer
         from leon_mal.radio import is_radio_channel
-        from adele_app.pages.player.media_player_page import MediaPlayerPage
-        from adele_app.pages.iml.html import ImlBrowserPage
+        MediaPlayerPage = get_page_class("MediaPlayerPage")
+        ImlBrowserPage = get_page_class("ImlBrowserPage")
 
         # Jira Bug STBV4V5-1176
         from leon_mal.userconfigmgmt import UserConfigMgmt
-        from adele_app.pages.player.demo_page import DemoVideoPage
-        from adele_app.pages.netflix.netflix_page import NetflixPage
+        DemoVideoPage = get_page_class("DemoVideoPage")
+        NetflixPage = get_page_class("NetflixPage")
 
         try:
             top_page = wuk.application.get_stack("main")[-1]
@@ -305,42 +374,52 @@ class BaseEventHandler(key_handlers.BaseEventHandler):
             and UserConfigMgmt()["channel_change_display_info"]:
             show_banner = False
 
+        def _play_radio(radio_channel):
+            def _cb_to_live(req):
+
+                if req.is_failed():
+                    log.error("Could not go back to live")
+                else:
+                    log.info("Could go back to live")
+                tv_page.back_to_tv()
+
+            main_hub = wuk.application.get('MainHub')
+            # Get / create TVPage
+            try:
+                tv_page = wuk.application.get("TVPage")
+                log.info("TV Page found in the stack")
+                tv_page._info_page_shown = False
+                tv_page.zap_with_asset(channel=radio_channel)
+            except PageNotFoundError:
+                tv_page = TVPage()
+                log.info("TV Page not found in the stack")
+                tv_page.show(above=main_hub,channel=radio_channel, ignore_banner=show_banner)
+                tv_page.back_to_tv()
+                tv_page.zap_with_asset(channel=radio_channel)
+            # Focus television on the main hub, for when we go back from fullscreen TV
+            if tv_page.is_playing_live:
+                tv_page.back_to_tv()
+            else:
+                TVPlayer().play_live(callback=_cb_to_live)
+            main_hub.focus_tv(instant_anim=True)
+            EpgPrefetcher().schedule(radio_channel)
+
         def _play_radio_cb(request):
             request.caller.close()
             if not request.is_succeeded():
                 log.error("Could not get radio channel: %r", request)
             else:
-                radio_channel = request.data['result'][0]
-
-                def _cb_to_live(req):
-
-                    if req.is_failed():
-                        log.error("Could not go back to live")
-                    else:
-                        log.info("Could go back to live")
-                    tv_page.back_to_tv()
-
-                main_hub = wuk.application.get('MainHub')
-                # Get / create TVPage
-                try:
-                    tv_page = wuk.application.get("TVPage")
-                    log.info("TV Page found in the stack")
-                    tv_page._info_page_shown = False
-                    tv_page.zap_with_asset(channel=radio_channel)
-                except PageNotFoundError:
-                    tv_page = TVPage()
-                    log.info("TV Page not found in the stack")
-                    tv_page.show(above=main_hub,channel=radio_channel, ignore_banner=show_banner)
-                    tv_page.back_to_tv()
-                    tv_page.zap_with_asset(channel=radio_channel)
-                # Focus television on the main hub, for when we go back from fullscreen TV
-                if tv_page.is_playing_live:
-                    tv_page.back_to_tv()
-                else:
-                    TVPlayer().play_live(callback=_cb_to_live)
-                main_hub.focus_tv(instant_anim=True)
+                _play_radio(request.data['result'][0])
+            span.close_after_update()
 
         last_tuned_radio_id = UserConfigMgmt()["last_tuned_radio"]['radio']
+        # Resolve the radio from the channel index, browse only if it is
+        # not built yet.
+        radio_channel = ChannelIndex().find_radio(last_tuned_radio_id)
+        if radio_channel is not None:
+            _play_radio(radio_channel)
+            return True
+        span = current_span().defer()
         search_criteria = retrieve_all_radio_search_criteria()
 
         if last_tuned_radio_id :
@@ -359,15 +438,14 @@ class BaseEventHandler(key_handlers.BaseEventHandler):
         AVR().send("HOTKEY", "onDemand")
         from leon_mal.services.ocid import OCIDService
         error_code = OCIDService().update_vod_parent(param=0)
-        from adele_app.pages.store import StoreFilterLayer
+        StoreFilterLayer = get_page_class("StoreFilterLayer")
         # Fix for #80370.
         self._show_filter_layer(StoreFilterLayer)
         return True
 
     def event_pvr(self, event):
         AVR().send("HOTKEY", "pvr")
-        from adele_app.pages.library.library_filter_layer import \
-            LibraryFilterLayerPage
+        LibraryFilterLayerPage = get_page_class("LibraryFilterLayerPage")
         # Fix for #80097 and #83259 .
         self._show_filter_layer(LibraryFilterLayerPage)
         return True
@@ -378,7 +456,7 @@ class BaseEventHandler(key_handlers.BaseEventHandler):
         even if in CUTV or TS"""
         AVR().send("HOTKEY", "tvguide")
 
-        from adele_app.pages.grid.epg_grid import EpgGridPage
+        EpgGridPage = get_page_class("EpgGridPage")
         from leon_mal.player import TVPlayer
 
         main_hub = wuk.application.get("MainHub")
@@ -413,9 +491,11 @@ class BaseEventHandler(key_handlers.BaseEventHandler):
                 timestamp = req.data["result"]["position"] / 1000
 
             _show_epg(timestamp=timestamp)
+            span.close_after_update()
 
         if TVPlayer().is_timeshift or TVPlayer().is_playing_cutv:
             # specific case when cutv or timeshit, open EPG on current program
+            span = current_span().defer()
             BasePlayer().get_renderer_connection().get_positions(
                 unit='ms', absolute=True, callback=_cb)
         else:
@@ -441,6 +521,15 @@ class FilterLayerEventHandler(BaseEventHandler):
         wuk.application.back_to("MainHub")
         return True
 
+    _vertical_moving = False
+    _pending_vertical_shift = 0
+    #: Number of the move in progress, its callbacks are ignored once
+    #: it timed out.
+    _vertical_move_number = 0
+    #: Key latency spans of the moves not displayed yet.
+    _vertical_spans = ()
+    _committed_vertical_spans = ()
+
     def event_up(self, event):
         self._vertical_event(event,
                              self.page.previous_focusable_element,
@@ -460,38 +549,204 @@ class FilterLayerEventHandler(BaseEventHandler):
 
         element: previous|next_focusable_element
         focus_action: focus_previous|next method
-        shift: -1/+1
+        shift: -1/+1, or the net shift of the merged key presses
+
+        While a move is in progress, the next key presses are merged
+        into a single net shift applied by one navigation batch.
         """
-        if element is None:
+        if event is not None:
+            self._vertical_spans = _add_span(self._vertical_spans,
+                                             current_span().defer())
+        if self._vertical_moving:
+            pending = self._pending_vertical_shift + shift
+            self._pending_vertical_shift = max(
+                -MAX_COALESCED_MOVES, min(pending, MAX_COALESCED_MOVES))
+            return
+        if element is None or not element.data_source:
+            self._close_vertical_spans(self._vertical_spans)
+            self._vertical_spans = ()
             return
-        if element.data_source:
-            # All horizontal lists are centered.
-            element.select(element.center_index,
-                           absolute=True,
-                           callback=self._vertical_event_cb,
-                           args=(focus_action, shift),
-                           wait_view=True,
-                           instant_anim=True)
+        move = self._begin_vertical_move()
+        # All horizontal lists are centered.
+        element.select(element.center_index,
+                       absolute=True,
+                       callback=self._vertical_event_cb,
+                       args=(focus_action, shift, move),
+                       wait_view=True,
+                       instant_anim=True)
+
+    def _begin_vertical_move(self):
+        self._vertical_moving = True
+        self._vertical_move_number += 1
+        move = self._vertical_move_number
+        Task(lambda: self._vertical_timeout(move)).start(
+            init_delay=NAVIGATION_TIMEOUT, auto_clean=True)
+        return move
+
+    def _vertical_timeout(self, move):
+        if move != self._vertical_move_number or not self._vertical_moving:
+            return
+        log.warning("Vertical move not done after %.1fs, dropping %d "
+                    "merged moves", NAVIGATION_TIMEOUT,
+                    self._pending_vertical_shift)
+        self._vertical_move_number += 1
+        self._vertical_moving = False
+        self._pending_vertical_shift = 0
+        self._close_vertical_spans(self._committed_vertical_spans)
+        self._committed_vertical_spans = ()
+        self._close_vertical_spans(self._vertical_spans)
+        self._vertical_spans = ()
 
     def _vertical_event_cb(self, request):
+        focus_action, shift, move = request.args
+        if move != self._vertical_move_number:
+            log.debug("Late vertical move: %r", request)
+            return
         if request.return_code not in ("ok", "already_selected"):
             log.warning(request)
+            self._vertical_moving = False
+            self._pending_vertical_shift = 0
+            self._close_vertical_spans(self._vertical_spans)
+            self._vertical_spans = ()
             return
-        focus_action, shift = request.args
         focus_action()
-        self.page.titles_list.select(shift)
-        self.page.navigation_list.select(shift)
-        scroll_bg_lines(self.page.focused_element)
+        self._commit_vertical_shift(shift, move)
+
+    def _commit_vertical_shift(self, shift, move):
+        """Apply the lists selections and the background scroll of a
+        ``shift`` rows move in one view update."""
+        self._committed_vertical_spans = self._vertical_spans
+        self._vertical_spans = ()
+        batch = NavigationBatch(
+            callback=lambda requests: self._vertical_batch_cb(requests,
+                                                              move))
+        batch.select(self.page.titles_list, shift)
+        batch.select(self.page.navigation_list, shift)
+        batch.call(scroll_bg_lines, self.page.focused_element)
+        batch.commit()
+
+    def _vertical_batch_cb(self, requests, move):
+        if move != self._vertical_move_number:
+            log.debug("Late vertical navigation batch: %r", requests)
+            return
+        # The move is done, its timeout does not apply anymore.
+        self._vertical_move_number += 1
+        self._close_vertical_spans(self._committed_vertical_spans)
+        self._committed_vertical_spans = ()
+        shift = self._pending_vertical_shift
+        self._pending_vertical_shift = 0
+        self._vertical_moving = False
+        if shift:
+            self._vertical_move(shift)
+
+    def _vertical_move(self, shift):
+        """Move the focus by ``shift`` rows.
+
+        The focus goes over the intermediate rows right away, only the
+        destination row is centered before getting the focus.
+        """
+        if shift > 0:
+            step, focus_action = 1, self.page.focus_next
+            get_element = lambda: self.page.next_focusable_element
+        else:
+            step, focus_action = -1, self.page.focus_previous
+            get_element = lambda: self.page.previous_focusable_element
+        moved = 0
+        while moved + step != shift:
+            element = get_element()
+            if element is None or not element.data_source:
+                break
+            focus_action()
+            moved += step
+        else:
+            element = get_element()
+            if element is not None and element.data_source:
+                self._vertical_event(None, element, focus_action, shift)
+                return
+        if moved:
+            # End of the layer reached before the destination row.
+            self._commit_vertical_shift(moved, self._begin_vertical_move())
+        else:
+            self._close_vertical_spans(self._vertical_spans)
+            self._vertical_spans = ()
+
+    def _close_vertical_spans(self, spans):
+        for span in spans:
+            span.close_after_update()
+
+    _horizontal_selecting = False
+    _pending_horizontal_shift = 0
+    _horizontal_spans = ()
+    #: Number of the selection in progress, its callback is ignored
+    #: once it timed out.
+    _horizontal_selection = 0
 
     def event_left(self, event):
-        self.page.focused_element.select(-1, callback=self._horizontal_cb)
+        self._horizontal_event(-1)
         return True
 
     def event_right(self, event):
-        self.page.focused_element.select(1, callback=self._horizontal_cb)
+        self._horizontal_event(1)
         return True
 
-    def _horizontal_cb(self, request):
+    def _horizontal_event(self, shift):
+        """Select the element at ``shift``.
+
+        While a selection is in progress, the next key presses are
+        merged into a single "move by N" selection.
+        """
+        self._horizontal_spans = _add_span(self._horizontal_spans,
+                                           current_span().defer())
+        if self._horizontal_selecting:
+            pending = self._pending_horizontal_shift + shift
+            self._pending_horizontal_shift = max(
+                -MAX_COALESCED_MOVES, min(pending, MAX_COALESCED_MOVES))
+            return
+        self._horizontal_select(shift)
+
+    def _horizontal_select(self, shift):
+        self._horizontal_selecting = True
+        self._horizontal_selection += 1
+        selection = self._horizontal_selection
+        Task(lambda: self._horizontal_timeout(selection)).start(
+            init_delay=NAVIGATION_TIMEOUT, auto_clean=True)
+        self.page.focused_element.select(
+            shift, callback=lambda request: self._horizontal_cb(request,
+                                                                selection))
+
+    def _horizontal_timeout(self, selection):
+        if selection != self._horizontal_selection:
+            return
+        log.warning("Horizontal selection not done after %.1fs, "
+                    "dropping %d merged moves", NAVIGATION_TIMEOUT,
+                    self._pending_horizontal_shift)
+        self._horizontal_selection += 1
+        self._horizontal_selecting = False
+        self._pending_horizontal_shift = 0
+        self._close_horizontal_spans()
+
+    def _horizontal_cb(self, request, selection):
+        if selection != self._horizontal_selection:
+            log.debug("Late horizontal selection: %r", request)
+            return
+        # The selection is done, its timeout does not apply anymore.
+        self._horizontal_selection += 1
+        shift = self._pending_horizontal_shift
+        self._pending_horizontal_shift = 0
         if request.is_failed():
+            self._horizontal_selecting = False
+            self._close_horizontal_spans()
             return
+        if shift:
+            # Key presses received meanwhile, the background is only
+            # scrolled once the list is idle.
+            self._horizontal_select(shift)
+            return
+        self._horizontal_selecting = False
         scroll_bg_lines(self.page.focused_element, request=request)
+        self._close_horizontal_spans()
+
+    def _close_horizontal_spans(self):
+        for span in self._horizontal_spans:
+            span.close_after_update()
+        self._horizontal_spans = ()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Key latency
+
+Key-to-display latency of the event handlers. Each key event opens a
+span when it reaches :class:`adele_app.handlers.BaseEventHandler`; the
+span is closed on the main loop iteration following the handler, i.e.
+once the view update it triggered is committed. Handlers going through
+asynchronous requests keep the span open with :meth:`KeySpan.defer`
+and close it from their final callback.
+
+Latencies are aggregated in fixed bucket histograms per page and key
+(no sample is kept) and dumped to ``KEY_LATENCY_REPORT`` every
+``DUMP_PERIOD`` seconds when new keys were recorded. Disabled with
+``KEY_LATENCY=0``.
+"""
+import json
+import os
+import time
+
+from bisect import bisect_left
+
+from peewee.debug import GET_LOGGER
+from peewee.misc_utils import MetaSingleton
+from peewee.notifier import Task
+
+
+log = GET_LOGGER(__name__)
+
+ENABLED = os.getenv("KEY_LATENCY", "1").lower() in ("1", "y", "yes", "true")
+REPORT_PATH = os.getenv("KEY_LATENCY_REPORT", "/tmp/key_latency.json")
+# Seconds between two report dumps.
+DUMP_PERIOD = 60.0
+# Histogram bucket upper bounds, in milliseconds.
+BUCKETS = (10, 20, 35, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500,
+           2000, 3000, 5000)
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram(object):
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        self.counts[bisect_left(BUCKETS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    def percentile(self, percent):
+        """Return the upper bound of the bucket holding ``percent``."""
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index < len(BUCKETS):
+                    return min(BUCKETS[index], self.max)
+                break
+        return self.max
+
+    def stats(self):
+        stats = {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "max": round(self.max, 1),
+        }
+        for percent in PERCENTILES:
+            stats["p%d" % percent] = self.percentile(percent)
+        return stats
+
+
+class KeySpan(object):
+
+    """Latency of one key event, in milliseconds once closed."""
+
+    __slots__ = ("name", "start", "deferred", "closed")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.deferred = False
+        self.closed = False
+
+    def defer(self):
+        """Keep the span open after the handler returns: the caller
+        must close it from its last callback."""
+        self.deferred = True
+        return self
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        KeyLatency().record(self.name, (time.time() - self.start) * 1000)
+
+    def close_after_update(self):
+        """Close the span on the next main loop iteration, once the
+        pending view update is committed."""
+        if not self.closed:
+            Task(self.close).start()
+
+    def cancel(self):
+        self.closed = True
+
+    def end(self):
+        if not self.deferred:
+            self.close_after_update()
+
+
+class _NullSpan(object):
+
+    def defer(self):
+        return self
+
+    def close(self):
+        pass
+
+    close_after_update = cancel = end = close
+
+
+NULL_SPAN = _NullSpan()
+
+
+class KeyLatency(object):
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self):
+        self.enabled = ENABLED
+        #: "page/key" -> LatencyHistogram.
+        self.histograms = {}
+        self._current = NULL_SPAN
+        self._dirty = False
+        self._dump_task = None
+
+    def begin(self, handler, event):
+        if not self.enabled:
+            return NULL_SPAN
+        self._current = KeySpan("%s/%s" % (type(handler.page).__name__,
+                                           event))
+        return self._current
+
+    def current(self):
+        """Return the span of the key being handled."""
+        return self._current
+
+    def end(self, span):
+        """End of the handler: close ``span`` unless deferred."""
+        span.end()
+        self._current = NULL_SPAN
+
+    def record(self, name, latency):
+        try:
+            histogram = self.histograms[name]
+        except KeyError:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.add(latency)
+        self._dirty = True
+        if self._dump_task is None:
+            self._dump_task = Task(self._dump_loop())
+            self._dump_task.start(init_delay=DUMP_PERIOD)
+
+    def stats(self):
+        return dict((name, histogram.stats())
+                    for name, histogram in self.histograms.iteritems())
+
+    def dump(self, path=REPORT_PATH):
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, "w") as output:
+                json.dump(self.stats(), output, indent=1, sort_keys=True)
+            os.rename(temp_path, path)
+        except (IOError, OSError), e:
+            log.warning("Cannot write key latency report to %r: %r",
+                        path, e)
+            return False
+        self._dirty = False
+        return True
+
+    def _dump_loop(self):
+        while True:
+            if self._dirty:
+                self.dump()
+            yield DUMP_PERIOD
+
+
+def current_span():
+    return KeyLatency().current()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Navigation batch
+
+Group the list selections and side effects of one navigation step so
+they are all issued in the same main loop iteration (hence rendered by
+the same view update) and followed by a single callback.
+"""
+from peewee.debug import GET_LOGGER
+
+
+log = GET_LOGGER(__name__)
+
+# Kinds of queued operations.
+SELECT, CALL = "select", "call"
+
+
+class NavigationBatch(object):
+
+    """Transactional set of list selections.
+
+    Usage::
+
+        batch = NavigationBatch(callback=_done)
+        batch.select(page.titles_list, shift)
+        batch.select(page.navigation_list, shift)
+        batch.call(scroll_bg_lines, page.focused_element)
+        batch.commit()
+
+    ``callback`` is called with the list of the selection requests once
+    all of them are done.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._operations = []
+        self._requests = []
+        self._pending = 0
+        self._committed = False
+
+    def select(self, widget, index, **kwargs):
+        """Queue ``widget.select(index, **kwargs)``."""
+        self._operations.append((SELECT, widget, index, kwargs))
+        return self
+
+    def call(self, function, *args, **kwargs):
+        """Queue a side effect run after the selections are issued."""
+        self._operations.append((CALL, function, args, kwargs))
+        return self
+
+    def commit(self):
+        if self._committed:
+            raise RuntimeError("Navigation batch already committed")
+        self._committed = True
+        selections = [operation[1:] for operation in self._operations
+                      if operation[0] == SELECT]
+        side_effects = [operation[1:] for operation in self._operations
+                        if operation[0] == CALL]
+        self._pending = len(selections)
+        for widget, index, kwargs in selections:
+            widget.select(index, callback=self._select_cb, **kwargs)
+        for function, args, kwargs in side_effects:
+            function(*args, **kwargs)
+        if not selections:
+            self._done()
+
+    def _select_cb(self, request):
+        if request.is_failed():
+            log.warning("Navigation batch selection failed: %r", request)
+        self._requests.append(request)
+        self._pending -= 1
+        if not self._pending:
+            self._done()
+
+    def _done(self):
+        if self.callback is not None:
+            self.callback(self._requests)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Page registry
+
+Map page names to their lazily imported classes. Heavy page modules
+can be preloaded during idle frames after the boot so the first key
+press reaching a page does not pay its import.
+"""
+import sys
+import time
+
+from peewee.debug import GET_LOGGER
+from peewee.misc_utils import MetaSingleton
+from peewee.notifier import Task
+
+
+log = GET_LOGGER(__name__)
+
+#: Page class name -> module defining it.
+PAGE_MODULES = {
+    "TVPage": "adele_app.pages.tv.tv_page",
+    "EpgGridPage": "adele_app.pages.grid.epg_grid",
+    "MediaPlayerPage": "adele_app.pages.player.media_player_page",
+    "DemoVideoPage": "adele_app.pages.player.demo_page",
+    "NetflixPage": "adele_app.pages.netflix.netflix_page",
+    "ImlBrowserPage": "adele_app.pages.iml.html",
+    "StoreFilterLayer": "adele_app.pages.store",
+    "LibraryFilterLayerPage": "adele_app.pages.library.library_filter_layer",
+}
+
+#: Pages preloaded after the boot, most likely next first (DTV, radio
+#: and guide keys).
+PRELOAD_HINTS = ("TVPage", "EpgGridPage", "MediaPlayerPage",
+                 "ImlBrowserPage", "NetflixPage", "DemoVideoPage",
+                 "StoreFilterLayer", "LibraryFilterLayerPage")
+
+
+class PageRegistry(object):
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self):
+        self._classes = {}
+        #: Page name -> (seconds spent importing, preloaded).
+        self.import_costs = {}
+        self._preload_queue = []
+        self._preload_task = None
+
+    def get(self, name):
+        """Return the page class ``name``, importing it if needed."""
+        try:
+            return self._classes[name]
+        except KeyError:
+            return self._load(name, preloaded=False)
+
+    def _load(self, name, preloaded):
+        module_name = PAGE_MODULES[name]
+        start = time.time()
+        __import__(module_name)
+        page_class = getattr(sys.modules[module_name], name)
+        cost = time.time() - start
+        self._classes[name] = page_class
+        self.import_costs[name] = (cost, preloaded)
+        log.info("Page %s %s in %.3fs", name,
+                 "preloaded" if preloaded else "imported", cost)
+        return page_class
+
+    def preload(self, names=PRELOAD_HINTS):
+        """Queue ``names`` to be imported, one per idle frame."""
+        for name in names:
+            if name not in self._classes and name not in self._preload_queue:
+                self._preload_queue.append(name)
+        if self._preload_task is None and self._preload_queue:
+            self._preload_task = Task(self._preload())
+            self._preload_task.start(consider_idle=True, auto_clean=True)
+
+    def _preload(self):
+        while self._preload_queue:
+            name = self._preload_queue.pop(0)
+            if name not in self._classes:
+                try:
+                    self._load(name, preloaded=True)
+                except Exception, e:
+                    log.warning("Cannot preload page %s: %r", name, e)
+            yield 0.1
+        self._preload_task = None
+        log.info("Page import costs: %s", ", ".join(
+            "%s=%.3fs" % (name, cost) for name, (cost, preloaded)
+            in sorted(self.import_costs.iteritems(),
+                      key=lambda item: -item[1][0])))
+
+
+def get_page_class(name):
+    return PageRegistry().get(name)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Readiness tracking
+
+Helpers to be notified as soon as a set of resources is ready instead
+of polling them on a fixed period.
+"""
+import time
+
+from peewee.debug import GET_LOGGER
+from peewee.misc_utils import MetaSingleton
+from peewee.notifier import Task, mainthread
+
+
+log = GET_LOGGER(__name__)
+
+# Seconds between two fallback checks of the pages cleared by a
+# PagesClearedLatch, for the pages not calling notify_view_states().
+PAGES_POLL_PERIOD = 0.05
+
+
+class ReadinessSet(object):
+
+    """Set of pending resources calling back once all are ready.
+
+    Resources are removed with :meth:`mark_ready` (from a
+    notification) or :meth:`refresh` (from a predicate, e.g. on a
+    watchdog poll). ``callback`` is called only once, when the set
+    becomes empty.
+    """
+
+    def __init__(self, pending, callback=None, name=None):
+        self.name = name
+        self.pending = set(pending)
+        self.callback = callback
+        self.done = False
+        self.cancelled = False
+        self.started_at = time.time()
+        self.ready_at = None
+
+    def __repr__(self):
+        return "<ReadinessSet %s pending=%r>" % (self.name,
+                                                 sorted(self.pending))
+
+    def mark_ready(self, key):
+        """Remove ``key`` from the pending set, return ``True`` if done."""
+        self.pending.discard(key)
+        return self.check()
+
+    def refresh(self, is_ready):
+        """Remove each pending resource for which ``is_ready`` is true."""
+        for key in list(self.pending):
+            if is_ready(key):
+                self.pending.discard(key)
+        return self.check()
+
+    def check(self):
+        if self.done or self.cancelled:
+            return self.done
+        if not self.pending:
+            self.done = True
+            self.ready_at = time.time()
+            log.info("%r ready after %.3fs", self,
+                     self.ready_at - self.started_at)
+            if self.callback is not None:
+                self.callback()
+        return self.done
+
+    def cancel(self):
+        self.cancelled = True
+        self.callback = None
+
+
+class NameOwnerWatcher(object):
+
+    """Dispatch the D-Bus ``NameOwnerChanged`` signal on the main thread.
+
+    Listeners are called with ``(name, new_owner)`` each time a bus name
+    gets a new owner. If the signal cannot be subscribed, listeners are
+    never called and callers must rely on their fallback poll.
+    """
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self):
+        self._listeners = []
+        self._dbus = None
+        self.available = False
+
+    def _subscribe(self):
+        from wydbus import WyDbus
+        from com import dbus
+        try:
+            self._dbus = dbus(bus=WyDbus(), name="org.freedesktop.DBus")
+            self._dbus.register(self._on_name_owner_changed,
+                                NameOwnerChanged="no_option")
+        except Exception, e:
+            log.warning("Cannot watch NameOwnerChanged, polling only: %r", e)
+            self._dbus = None
+            return False
+        return True
+
+    def register(self, listener):
+        if not self._listeners and self._dbus is None:
+            self.available = self._subscribe()
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        return self.available
+
+    def unregister(self, listener):
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            log.debug("Listener %r not registered.", listener)
+        if not self._listeners and self._dbus is not None:
+            try:
+                self._dbus.unregister(self._on_name_owner_changed)
+            except Exception, e:
+                log.debug("Cannot unregister NameOwnerChanged: %r", e)
+            self._dbus = None
+            self.available = False
+
+    def has_owner(self, name):
+        """Synchronous ``NameHasOwner`` check."""
+        from wydbus import WyDbus
+        from com import dbus
+        proxy = self._dbus or dbus(bus=WyDbus(), name="org.freedesktop.DBus")
+        return proxy.NameHasOwner(name)
+
+    @mainthread
+    def _on_name_owner_changed(self, name, old_owner="", new_owner=""):
+        self._dispatch(name, new_owner)
+
+    def _dispatch(self, name, new_owner):
+        if not new_owner:
+            return
+        for listener in list(self._listeners):
+            listener(name, new_owner)
+
+
+class _BusNameWaiter(object):
+
+    def __init__(self, name, callback, timeout, poll_period):
+        self.name = name
+        self.callback = callback
+        self.timeout = timeout
+        self.poll_period = poll_period
+        self.done = False
+        self._deadline = None
+
+    def start(self):
+        # The timeout runs from now, not from the first poll.
+        self._deadline = time.time() + self.timeout
+        if self._has_owner():
+            self._finish(True)
+            return
+        NameOwnerWatcher().register(self._name_owner_changed)
+        # The poll is a fallback when NameOwnerChanged is not available,
+        # it also enforces the deadline.
+        Task(self._poll()).start(init_delay=self.poll_period)
+
+    def cancel(self):
+        self.callback = None
+        self._finish(False)
+
+    def _has_owner(self):
+        try:
+            return bool(NameOwnerWatcher().has_owner(self.name))
+        except Exception, e:
+            log.debug("NameHasOwner(%r) failed: %r", self.name, e)
+            return False
+
+    def _name_owner_changed(self, name, new_owner):
+        if name == self.name:
+            self._finish(True)
+
+    def _view_states_changed(self, page):
+        if page in self._readiness.pending and _is_cleared(page):
+            self.cleared_after[page] = (time.time() -
+                                        self._readiness.started_at)
+            self._readiness.mark_ready(page)
+
+    def _poll(self):
+        while not self.done:
+            if self._has_owner():
+                self._finish(True)
+            elif time.time() >= self._deadline:
+                log.info("%r has no owner after %.1fs", self.name,
+                         self.timeout)
+                self._finish(False)
+            else:
+                yield self.poll_period
+
+    def _finish(self, has_owner):
+        if self.done:
+            return
+        self.done = True
+        NameOwnerWatcher().unregister(self._name_owner_changed)
+        if self.callback is not None:
+            self.callback(has_owner)
+
+
+def wait_for_bus_name(name, callback, timeout=3.0, poll_period=0.5):
+    """Call ``callback(has_owner)`` once ``name`` has an owner on the bus
+    or after ``timeout`` seconds, without blocking the main loop.
+
+    Return an object whose ``cancel()`` method drops the wait.
+    """
+    waiter = _BusNameWaiter(name, callback, timeout, poll_period)
+    waiter.start()
+    return waiter
+
+
+class ViewStatesWatcher(object):
+
+    """Dispatch the view states changes of the pages.
+
+    Pages call :func:`notify_view_states` when they add or remove a view
+    state, e.g. when ``"ready"`` is removed once their surfaces are
+    released. Listeners are called with the page.
+    """
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self):
+        self._listeners = []
+
+    def register(self, listener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def unregister(self, listener):
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            log.debug("Listener %r not registered.", listener)
+
+    def notify(self, page):
+        for listener in list(self._listeners):
+            listener(page)
+
+
+def notify_view_states(page):
+    """Tell the listeners that the view states of ``page`` changed."""
+    ViewStatesWatcher().notify(page)
+
+
+def _is_cleared(page):
+    return "ready" not in page.view_states
+
+
+class PagesClearedLatch(object):
+
+    """Call ``callback(late_pages)`` once none of ``pages`` has the
+    ``"ready"`` view state anymore, or after ``timeout`` seconds with
+    the pages still not cleared.
+
+    Pages are checked on each :func:`notify_view_states` and, for the
+    pages which do not call it, every :data:`PAGES_POLL_PERIOD` seconds.
+    """
+
+    def __init__(self, pages, callback, timeout=5.0, name="pages_cleared"):
+        self.name = name
+        self.callback = callback
+        self.timeout = timeout
+        #: Page -> seconds it took to be cleared.
+        self.cleared_after = {}
+        self._readiness = ReadinessSet(pages, callback=self._cleared,
+                                       name=name)
+        self._finished = False
+
+    def start(self):
+        if self._refresh():
+            return
+        ViewStatesWatcher().register(self._view_states_changed)
+        Task(self._poll()).start(init_delay=PAGES_POLL_PERIOD)
+
+    def cancel(self):
+        self.callback = None
+        self._finish([])
+
+    def _refresh(self):
+        now = time.time()
+        for page in list(self._readiness.pending):
+            if _is_cleared(page):
+                self.cleared_after[page] = now - self._readiness.started_at
+        return self._readiness.refresh(_is_cleared)
+
+    def _view_states_changed(self, page):
+        if page in self._readiness.pending and _is_cleared(page):
+            self.cleared_after[page] = (time.time() -
+                                        self._readiness.started_at)
+            self._readiness.mark_ready(page)
+
+    def _poll(self):
+        deadline = self._readiness.started_at + self.timeout
+        while not self._finished:
+            if self._refresh():
+                break
+            if time.time() >= deadline:
+                self._finish(list(self._readiness.pending))
+                break
+            yield PAGES_POLL_PERIOD
+
+    def _cleared(self):
+        self._finish([])
+
+    def _finish(self, late_pages):
+        if self._finished:
+            return
+        self._finished = True
+        self._readiness.cancel()
+        ViewStatesWatcher().unregister(self._view_states_changed)
+        for page, delay in sorted(self.cleared_after.iteritems(),
+                                  key=lambda item: -item[1]):
+            log.debug("%s: %r cleared after %.3fs", self.name, page, delay)
+        for page in late_pages:
+            log.error("%s: %r not cleared after %.1fs, view states: %r",
+                      self.name, page, self.timeout, page.view_states)
+        if self.callback is not None:
+            self.callback(late_pages)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Request group
+
+Wait for concurrent asynchronous requests (any call taking a
+``callback`` called with a :class:`peewee.request.Request`) with a
+timeout, recording the latency of each branch.
+
+Usage::
+
+    group = RequestGroup(_done, timeout=10.0, name="standby")
+    close_renderer(callback=group.branch("close_renderer"))
+    back_to_home(callback=group.branch("back_to_home"))
+    group.start()
+
+``_done(group)`` is called once, when every branch completed or the
+timeout expires; branches completing afterwards are only logged.
+"""
+import time
+
+from peewee.debug import GET_LOGGER
+from peewee.notifier import Task
+
+
+log = GET_LOGGER(__name__)
+
+
+class RequestGroup(object):
+
+    def __init__(self, callback, timeout=None, name="requests",
+                 timeline=None, category="branch"):
+        self.callback = callback
+        self.timeout = timeout
+        self.name = name
+        self.timeline = timeline
+        self.category = category
+        #: Branch names in creation order.
+        self.branches = []
+        #: Branch name -> completed request.
+        self.requests = {}
+        #: Branch name -> seconds from its creation to its completion.
+        self.latencies = {}
+        self.done = False
+        self.timed_out = False
+        self.cancelled = False
+        self._started_at = {}
+        self._running = False
+
+    def __repr__(self):
+        return "<RequestGroup %s pending=%r>" % (self.name, self.pending)
+
+    @property
+    def pending(self):
+        return [name for name in self.branches if name not in self.requests]
+
+    @property
+    def succeeded(self):
+        """Whether every branch completed with a succeeded request."""
+        return (not self.pending and
+                all(request.is_succeeded()
+                    for request in self.requests.itervalues()))
+
+    def branch(self, name):
+        """Return the callback to give to the request of branch ``name``."""
+        if name in self._started_at:
+            raise ValueError("Branch %r already in %r" % (name, self))
+        self.branches.append(name)
+        self._started_at[name] = time.time()
+
+        def _callback(request):
+            self._branch_done(name, request)
+        return _callback
+
+    def start(self):
+        """Start waiting, once all branches are created."""
+        self._running = True
+        if self.timeout is not None:
+            Task(self._timeout).start(init_delay=self.timeout)
+        self._check()
+
+    def cancel(self):
+        """Drop the group: its callback will not be called.
+
+        The branch requests are not cancelled, they run to their end and
+        their completion is only logged.
+        """
+        self.cancelled = True
+        self.callback = None
+        self.done = True
+
+    def _branch_done(self, name, request):
+        if name in self.requests:
+            return
+        end = time.time()
+        self.requests[name] = request
+        self.latencies[name] = end - self._started_at[name]
+        if self.timeline is not None:
+            self.timeline.complete(name, self._started_at[name], end,
+                                   category=self.category,
+                                   succeeded=request.is_succeeded(),
+                                   late=self.done)
+        if self.done:
+            log.info("%s: branch %s completed after the group, in %.3fs",
+                     self.name, name, self.latencies[name])
+            return
+        self._check()
+
+    def _check(self):
+        if self.done or not self._running:
+            return
+        if not self.pending:
+            self._finish()
+
+    def _timeout(self):
+        if self.done:
+            return
+        self.timed_out = True
+        log.error("%s: timeout after %.1fs, pending branches: %r",
+                  self.name, self.timeout, self.pending)
+        self._finish()
+
+    def _finish(self):
+        self.done = True
+        log.info("%s: done (%s), branch latencies: %s", self.name,
+                 "succeeded" if self.succeeded else "failed",
+                 ", ".join("%s=%.3fs" % (name, self.latencies[name])
+                           for name in self.branches
+                           if name in self.latencies))
+        if self.callback is not None:
+            self.callback(self)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Resume state
+
+Cheap snapshot of what the standby exit checkup depends on: network
+links, default route and box assignment. It is captured when entering
+standby and compared on wake so the full checkup can be deferred when
+nothing changed.
+"""
+import os
+import time
+
+from peewee.debug import GET_LOGGER
+
+from leon_mal.services.ocid import OCIDService
+
+
+log = GET_LOGGER(__name__)
+
+SYS_CLASS_NET = "/sys/class/net"
+PROC_NET_ROUTE = "/proc/net/route"
+# Link attributes compared: the link state, not its history. A cable
+# unplugged and plugged back during standby leaves the same state.
+LINK_ATTRIBUTES = ("operstate", "carrier", "address")
+
+
+def _read(path):
+    try:
+        with open(path) as attribute:
+            return attribute.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def _links():
+    try:
+        interfaces = os.listdir(SYS_CLASS_NET)
+    except OSError:
+        return None
+    return dict((interface, tuple(_read(os.path.join(SYS_CLASS_NET,
+                                                     interface, attribute))
+                                  for attribute in LINK_ATTRIBUTES))
+                for interface in sorted(interfaces) if interface != "lo")
+
+
+def _default_route():
+    try:
+        with open(PROC_NET_ROUTE) as routes:
+            for line in routes.readlines()[1:]:
+                fields = line.split()
+                # Iface, Destination, Gateway
+                if len(fields) > 2 and fields[1] == "00000000":
+                    return fields[0], fields[2]
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def capture_resume_state():
+    state = {
+        "time": time.time(),
+        "links": _links(),
+        "default_route": _default_route(),
+    }
+    ocid = OCIDService()
+    try:
+        state["boot_status"] = ocid.boot_status_get()
+        state["sw_update"] = ocid.sw_update_state_get()
+    except Exception, e:
+        log.warning("Cannot read OCID state: %r", e)
+        state["boot_status"] = state["sw_update"] = None
+    return state
+
+
+def resume_state_changes(before, after):
+    """Return the names of the entries that differ between the two
+    states, unknown entries count as changed."""
+    changes = []
+    for key in ("links", "default_route", "boot_status", "sw_update"):
+        if before.get(key) is None or before.get(key) != after.get(key):
+            changes.append(key)
+    return changes
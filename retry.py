@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Retry scheduling
+
+Delays for the polling generators run by a :class:`Task`: probe fast
+right after start, then back off exponentially with jitter until a
+wall-clock deadline.
+"""
+import random
+import time
+
+from peewee.debug import GET_LOGGER
+
+
+log = GET_LOGGER(__name__)
+
+# Last schedule of each name, see retry_stats().
+_schedules = {}
+
+
+class RetrySchedule(object):
+
+    """Retry delays of a polling generator.
+
+    Usage in a generator started with ``Task(generator).start()``::
+
+        schedule = RetrySchedule("my_node")
+        while not schedule.expired:
+            if check():
+                schedule.succeed()
+                break
+            yield schedule.next_delay()
+        else:
+            timeout()
+
+    :param fast_delay: delay between the probes of the fast phase.
+    :param fast_period: duration of the fast phase, in seconds.
+    :param max_delay: upper bound of the backoff delay.
+    :param factor: backoff multiplier applied after the fast phase.
+    :param jitter: relative random variation applied to each delay.
+    :param deadline: seconds after which :attr:`expired` is true.
+    """
+
+    def __init__(self, name, fast_delay=0.25, fast_period=2.0, max_delay=3.0,
+                 factor=1.5, jitter=0.2, deadline=600.0):
+        self.name = name
+        self.fast_delay = fast_delay
+        self.fast_period = fast_period
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self.attempts = 0
+        self.started_at = time.time()
+        self.succeeded_at = None
+        self._delay = fast_delay
+        _schedules[name] = self
+
+    def __repr__(self):
+        return "<RetrySchedule %s attempts=%d>" % (self.name, self.attempts)
+
+    @property
+    def elapsed(self):
+        return (self.succeeded_at or time.time()) - self.started_at
+
+    @property
+    def expired(self):
+        return (self.succeeded_at is None and
+                time.time() - self.started_at >= self.deadline)
+
+    def next_delay(self):
+        """Count a failed attempt and return the delay before the next."""
+        self.attempts += 1
+        if time.time() - self.started_at < self.fast_period:
+            return self.fast_delay
+        self._delay = min(self._delay * self.factor, self.max_delay)
+        delay = self._delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        # Never sleep past the deadline.
+        remaining = self.deadline - (time.time() - self.started_at)
+        return max(0, min(delay, remaining))
+
+    def succeed(self, at=None):
+        """Count the successful attempt, made at ``at`` if given."""
+        self.attempts += 1
+        self.succeeded_at = time.time() if at is None else at
+        log.info("%s succeeded after %d attempts in %.3fs",
+                 self.name, self.attempts, self.elapsed)
+
+    def stats(self):
+        return {
+            "attempts": self.attempts,
+            "elapsed": round(self.elapsed, 3),
+            "time_to_success": (round(self.elapsed, 3)
+                                if self.succeeded_at is not None else None),
+            "expired": self.expired,
+        }
+
+
+def retry_stats():
+    """Return the stats of the last schedule of each name."""
+    return dict((name, schedule.stats())
+                for name, schedule in _schedules.iteritems())
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
+import time
+from contextlib import contextmanager
 
 from peewee.debug import GET_LOGGER
 from peewee.notifier import mainthread, Task
@@ -23,26 +25,62 @@ from leon_app_tools.return_codes import (
     SW_UPDATE_NOT_READY, NO_SW_UPDATE,
     SW_UPDATE_DOWNLOAD, SW_UPDATE_DOWNLOAD_IN_PROGRESS,
     SW_UPDATE_DOWNLOAD_FAILED, OCI_NETWORK_TIMEOUT,
-    SW_UPDATE_NAND_WRITE, SW_UPDATE_NAND_WRITE_FAILED)
+    SW_UPDATE_NAND_WRITE_FAILED)
 
 
 from leon_app_tools.fpdisplay_tools import FrontPanelTools
 
-from adele_app.facilities import SimpleRequestJoiner, show_pip
+from adele_app.facilities import show_pip
 from adele_app.facilities.main_hub import back_to_home
 from adele_app.facilities.boot_fixtures import \
     refresh_front_pannel_on_play_failed
 from adele_app.facilities.notifications import notifications_handler
+from adele_app.readiness import PagesClearedLatch
+from adele_app.request_group import RequestGroup
+from adele_app.resume_state import capture_resume_state, resume_state_changes
+from adele_app.tracing import Timeline, trace_output_path
 
-import ConfigParser
 from leon_mal.avr import AVR
 from leon_mal.services.ocid import OCIDService
-from adele_app.tools.utilities import hdd_info_parse
-from adele_app.tools.utilities import avr_software_firmware_info_args
+from adele_app.standby_inventory import StandbyInventory
 
 log = GET_LOGGER(__name__)
 features_cec = "cec" in features
 
+# Seconds given to the top pages to release their surfaces before
+# entering standby anyway.
+STANDBY_PAGES_TIMEOUT = 5.0
+# Seconds given to the middleware calls of the standby entry (last
+# position save, renderer close, return to main hub) before going on.
+STANDBY_REQUESTS_TIMEOUT = 10.0
+# Standby transitions timelines are only dumped when STANDBY_TRACE is
+# set to a path, e.g. /tmp/%s_trace.json (%s is replaced by the
+# transition name).
+STANDBY_TRACE_PATH = trace_output_path("STANDBY_TRACE", "")
+
+
+def _budget(env_name, default):
+    try:
+        return float(os.getenv(env_name, default))
+    except ValueError:
+        return None
+
+
+# Seconds over which a standby entry or exit logs its worst phase.
+STANDBY_ENTRY_BUDGET = _budget("STANDBY_ENTRY_BUDGET", "3.0")
+STANDBY_EXIT_BUDGET = _budget("STANDBY_EXIT_BUDGET", "3.0")
+
+# Resume fast path: when the network and assignment state did not
+# change during standby, live TV is started right away without the full
+# checkup. The state is compared again RESUME_CHECKUP_DELAY seconds
+# later, once the network settled, and the full checkup only runs if it
+# changed. Enabled with RESUME_FAST_PATH=1, never after standbys longer
+# than RESUME_FAST_MAX_STANDBY.
+RESUME_FAST_PATH = os.getenv("RESUME_FAST_PATH", "0").lower() in (
+    "1", "y", "yes", "true")
+RESUME_FAST_MAX_STANDBY = 4 * 3600
+RESUME_CHECKUP_DELAY = 5.0
+
 
 def _get_top_pages():
     # Get pages on top in main and popup stack before back to MainHub
@@ -74,6 +112,18 @@ class Standby(object):
         self.front_panel = FrontPanelTools()
         self.player = TVPlayer()
         self.power_management = MediaRoot().get_service('power_management')
+        #: Timeline of the standby transition in progress.
+        self.timeline = None
+        #: Network and assignment state captured on standby entry.
+        self._resume_state = None
+        #: Entry state a fast resume is checked against, set while its
+        #: deferred check is scheduled.
+        self._check_up_state = None
+        #: Incremented on each standby entry and exit: the callbacks of
+        #: an entry interrupted by an exit are ignored.
+        self._transition = 0
+        self._standby_requests = None
+        self._pages_latch = None
 
     def setup(self):
         self.wystandby.register(self._apd_warning_handler,
@@ -87,6 +137,9 @@ class Standby(object):
         self.wystandby.enable_passive_standby(conf["coc_v8_enabled"])
         self.wystandby.set_apd_warning_timeout(conf["apd_warning_timeout"])
         self.wystandby.set_apd_timeout(conf["apd_timeout"])
+        # Read the POWER-CYCLE AVR data before the first standby.
+        Task(StandbyInventory().prewarm).start(consider_idle=True,
+                                               auto_clean=True)
 
     @mainthread
     def _apd_warning_handler(self):
@@ -95,8 +148,21 @@ class Standby(object):
 
     def _enter_standby(self, changes):
         log.info("Entering standby")
+        self._begin_transition("standby_entry")
+        self._check_up_state = None
+        self._transition += 1
+        transition = self._transition
         self.power_management = changes['state']
         wuk.application.hold = True
+        self._resume_state = None
+        if RESUME_FAST_PATH:
+            # Off the ack path: if it did not run before the box
+            # suspended, the resume runs the full checkup.
+            def _capture_resume_state():
+                if self._is_current(transition, "resume state capture"):
+                    self._resume_state = capture_resume_state()
+            Task(_capture_resume_state).start(consider_idle=True,
+                                              auto_clean=True)
         record_page = None
         try:
             record_page = wuk.application.get_stack("main").get("BrowserPage")
@@ -112,29 +178,58 @@ class Standby(object):
         top_pages = _get_top_pages()
         log.info("top pages: %s", top_pages)
         # Unregister signals
-        self._toggle_signals_registration(register=False)
+        with self._phase("unregister_signals"):
+            self._toggle_signals_registration(register=False)
         # Differ this processing to speedup close_renderer_connection
-        notifications_handler.close_all_notifications()
+        with self._phase("close_notifications"):
+            notifications_handler.close_all_notifications()
         # Disable front panel display
         log.info("standby front_panel")
-        self.front_panel.in_standby(True)
-        self.front_panel.reset_front_panel(power_on_icon=False)
+        with self._phase("front_panel"):
+            self.front_panel.in_standby(True)
+            self.front_panel.reset_front_panel(power_on_icon=False)
 
         def _enter_standby_cb(requests):
-            if all((r.is_succeeded() for r in requests)):
+            self._standby_requests = None
+            if not self._is_current(transition, "standby requests"):
+                return
+            if requests.succeeded:
                 log.info("Back to main hub with closed renderer connection.")
             else:
                 log.error("Something went wrong while trying to return to "
                           "main and close renderer connection.")
-            Task(self._check_top_pages_state(top_pages ,record_page, be_patient_page)).start()
+            self._check_top_pages_state(top_pages ,record_page, be_patient_page,
+                                        transition)
+
+        # Set once the renderer close started, by the last position save
+        # or its timeout.
+        connection_closing = []
 
         def _connection_close_cb():
+            if connection_closing:
+                return
+            if not self._is_current(transition, "last position save"):
+                return
+            connection_closing.append(True)
             log.debug("_connection_close_cb")
-            requests = SimpleRequestJoiner(_enter_standby_cb)
-            requests.append(
-                self._close_renderer_connection(callback=requests.callback))
-            requests.append(
-                self._return_to_main_hub(callback=requests.callback))
+            self._end_phase("save_last_position")
+            # Both run concurrently, neither can hold standby forever.
+            requests = self._standby_requests = RequestGroup(
+                _enter_standby_cb, timeout=STANDBY_REQUESTS_TIMEOUT,
+                name="standby_requests", timeline=self.timeline,
+                category="phase")
+            self._close_renderer_connection(
+                callback=requests.branch("close_renderer_connection"))
+            self._return_to_main_hub(
+                callback=requests.branch("return_to_main_hub"))
+            requests.start()
+
+        def _last_position_timeout():
+            if (not connection_closing and
+                    self._is_current(transition, "last position timeout")):
+                log.error("Last position not saved after %.1fs, going on.",
+                          STANDBY_REQUESTS_TIMEOUT)
+                _connection_close_cb()
 
         save_last_pos_flag = False
         try:
@@ -149,6 +244,9 @@ class Standby(object):
                     main_hub.nav_direction = 0
                 if not TVPlayer().is_playing_cutv or main_hub.last_played_item == None:
                     main_hub.last_played_item = BasePlayer().playing_item
+                self._begin_phase("save_last_position")
+                Task(_last_position_timeout).start(
+                    init_delay=STANDBY_REQUESTS_TIMEOUT)
                 BasePlayer()._set_playing_item_last_position(connecion_close_cb=_connection_close_cb)
             except:
                 log.info("Got exception in _set_playing_item_last_position")
@@ -195,6 +293,7 @@ class Standby(object):
             log.debug("STANDBY - Relock stream")
 
             def _relock_stream_cb(req):
+                self._end_phase("relock_stream")
                 if req.is_failed():
                     # Just log error, but go to standby anyway.
                     log.error("Relock stream failed: %r", req.return_code)
@@ -204,6 +303,7 @@ class Standby(object):
                 ParentalControl().unregister_global_signals()
                 if self.player.get_renderer_connection():
                     def _close_cb(req):
+                        self._end_phase("close_renderer")
                         if req.is_failed():
                             # Just log error, but go to standby anyway
                             log.error("Close renderer connection failed: %r",
@@ -215,11 +315,13 @@ class Standby(object):
                         request.call_final_callback()
 
                     log.debug("Close renderer connection.")
+                    self._begin_phase("close_renderer")
                     self.player.close_renderer_connection(callback=_close_cb)
                 else:
                     request.succeed()
                     request.call_final_callback()
 
+            self._begin_phase("relock_stream")
             renderer_connection.relock_stream(callback=_relock_stream_cb)
         else:
             log.debug("Renderer connection already closed.")
@@ -228,59 +330,90 @@ class Standby(object):
 
         return request
 
-    def _check_top_pages_state(self, top_pages, record_page, be_patient_page):
+    def _check_top_pages_state(self, top_pages, record_page, be_patient_page,
+                               transition):
         """Make sure all pages above main hub are cleared."""
         log.info("Checking state of pages: %r", top_pages)
-        while True:
-            for page in list(top_pages):
-                log.debug("%r view state: %r", page, page.view_states)
-                if "ready" not in page.view_states:
-                    top_pages.remove(page)
-                    log.debug("Page %r is cleared.", page)
-                else:
-                    log.info("Page %r is not yet cleared.", page)
-            if not top_pages:
-                if record_page is not None:
-                    log.info("BrowserPage : %s releasing it ", record_page)
-                    record_page._unregister_nexus_released()
-                else:
-                    log.info("BrowserPage : not found ")
 
-                if be_patient_page is not None:
-                    log.debug("be_patient_page is cleared.")
-                    be_patient_page.remove()
-                else:
-                    log.info("be_patient_page : not found ")
+        def _top_pages_cleared(late_pages):
+            self._pages_latch = None
+            if not self._is_current(transition, "pages clearing"):
+                return
+            self._end_phase("pages_cleared", late_pages=len(late_pages))
+            if record_page is not None:
+                log.info("BrowserPage : %s releasing it ", record_page)
+                record_page._unregister_nexus_released()
+            else:
+                log.info("BrowserPage : not found ")
+
+            if be_patient_page is not None:
+                log.debug("be_patient_page is cleared.")
+                be_patient_page.remove()
+            else:
+                log.info("be_patient_page : not found ")
 
+            if late_pages:
+                log.error("Entering standby with pages not cleared: %r",
+                          late_pages)
+            else:
                 log.info("All top pages are cleared.")
-                root_page = wuk.application.get_stack("background")[0]
+            root_page = wuk.application.get_stack("background")[0]
 
-                main_hub = wuk.application.get('MainHub')
-                main_hub.hide_main_hub_page_elements()
+            main_hub = wuk.application.get('MainHub')
+            main_hub.hide_main_hub_page_elements()
 
+            with self._phase("root_page_enter_standby"):
                 root_page.enter_standby()
-                log.info("Ready to go into standby!")
-                self.power_management.ack_state_change()
-                raise StopIteration
-            else:
-                log.debug("Pages not yet all cleared.")
-                yield 0.05
+            log.info("Ready to go into standby!")
+            self.power_management.ack_state_change()
+            self._end_transition(STANDBY_ENTRY_BUDGET)
+
+        self._begin_phase("pages_cleared")
+        self._pages_latch = PagesClearedLatch(top_pages, _top_pages_cleared,
+                                              timeout=STANDBY_PAGES_TIMEOUT,
+                                              name="standby_pages")
+        self._pages_latch.start()
+
+    def _is_current(self, transition, what):
+        """Return whether ``transition`` is still the standby transition
+        in progress, log ``what`` is ignored otherwise."""
+        if transition == self._transition:
+            return True
+        log.warning("[STANDBY] %s of an interrupted standby entry ignored.",
+                    what)
+        return False
+
+    def _cancel_standby_entry(self):
+        """Drop the standby entry steps still in flight."""
+        self._transition += 1
+        if self._standby_requests is not None:
+            log.warning("[STANDBY] waking up with pending standby "
+                        "requests: %r", self._standby_requests.pending)
+            self._standby_requests.cancel()
+            self._standby_requests = None
+        if self._pages_latch is not None:
+            self._pages_latch.cancel()
+            self._pages_latch = None
 
     def _leave_standby(self, changes):
         log.info("Leaving standby")
+        self._begin_transition("standby_exit")
+        self._cancel_standby_entry()
         if features_cec:
             # CR CEC: re-activate cec,
             # if CEC not activated due to a user reboot (remote or sw update)
             # to be sure, cec will wake-up tv
-            MediaRoot().get_service("cec").synchronize()
+            with self._phase("cec_synchronize"):
+                MediaRoot().get_service("cec").synchronize()
         # Enable front panel display
-        self.front_panel.in_standby(False)
-        self.front_panel.restore_front_panel()
-        # As for now, no page is handling the Front Panel, so there is no page
-        # to write on the front panel We manualy reset the text to "Welcome +"
-        # for now, until some other components like the TVPlayer page handle
-        # the Front Panel
-        self.front_panel.display_text("Welcome +")
+        with self._phase("front_panel"):
+            self.front_panel.in_standby(False)
+            self.front_panel.restore_front_panel()
+            # As for now, no page is handling the Front Panel, so there is
+            # no page to write on the front panel We manualy reset the text
+            # to "Welcome +" for now, until some other components like the
+            # TVPlayer page handle the Front Panel
+            self.front_panel.display_text("Welcome +")
 
         try:
             # get the netflix page. If it fails, it throws a PageNotFoundError
@@ -290,9 +423,32 @@ class Standby(object):
             # 'self.player' here is the TVPlayer, so calling start_renderer will
             # also call set_polling_mode on the TVPlayer, and reconnect it to
             # mediarenderer 'program changes' signals
+            self._begin_phase("start_renderer")
             self.player.start_renderer(self._leave_standby_callback)
+        else:
+            self._end_transition(STANDBY_EXIT_BUDGET)
+
+    def _can_resume_fast(self):
+        """Return whether nothing the full checkup depends on changed
+        during standby."""
+        state, self._resume_state = self._resume_state, None
+        if state is None:
+            return False
+        if time.time() - state["time"] > RESUME_FAST_MAX_STANDBY:
+            log.info("Long standby, full checkup on resume.")
+            return False
+        with self._phase("compare_resume_state"):
+            changes = resume_state_changes(state, capture_resume_state())
+        if changes:
+            log.info("Changed during standby: %s, full checkup on resume.",
+                     ", ".join(changes))
+            return False
+        self._check_up_state = state
+        return True
 
     def _leave_standby_callback(self, request):
+        self._end_phase("start_renderer")
+        fast_resume = self._can_resume_fast()
         ParentalControl().register_global_signals()
         main_hub = wuk.application.get('MainHub')
         main_hub.zap_conflict['out_from_standby'] = True
@@ -306,17 +462,26 @@ class Standby(object):
             def _standby_leave_callback():
                 wuk.application.hold = False
 
-            main_hub.update_access_point_and_swimlane(callback=_standby_leave_callback)
+            if not fast_resume:
+                main_hub.update_access_point_and_swimlane(callback=_standby_leave_callback)
+        if fast_resume:
+            # Nothing left to wait for, the swimlanes are refreshed with
+            # the deferred checkup.
+            wuk.application.hold = False
         root_page = wuk.application.get_stack("background")[0]
-        root_page.leave_standby()
+        with self._phase("root_page_leave_standby"):
+            root_page.leave_standby()
 
-        self._toggle_signals_registration(register=True)
+        with self._phase("register_signals"):
+            self._toggle_signals_registration(register=True)
         self.power_management.ack_state_change()
         log.info("Successfully came out of standby!")
 
         # this callback refreshed the front pannel in case of play last_tunned
         # channel failure + throws the AVR log
         def on_play_cb(request):
+            self._end_phase(play_phase)
+            self._end_transition(STANDBY_EXIT_BUDGET)
             refresh_front_pannel_on_play_failed(request)
             if request.is_succeeded():
                 #show operator messages
@@ -333,10 +498,87 @@ class Standby(object):
             # get the netflix page. If it fails, it throws a PageNotFoundError
             wuk.application.get('NetflixPage')
         except PageNotFoundError:
+            if fast_resume:
+                log.info("Nothing changed during standby, playing live TV "
+                         "before the checkup.")
+                play_phase = "play_live"
+                self._begin_phase(play_phase)
+                self.player.play_live(callback=on_play_cb)
+                Task(self._deferred_check_up).start(
+                    init_delay=RESUME_CHECKUP_DELAY, consider_idle=True,
+                    auto_clean=True)
+                return
             # Some check up are necessary for dortor repair.
             # They are sensibly the same than when the ethernet cable is inplug
             # So ask the RootPage to do a checkup
+            play_phase = "force_check_up"
+            self._begin_phase(play_phase)
             wuk.application.get('RootPage').force_check_up(on_play_cb)
+        else:
+            self._end_transition(STANDBY_EXIT_BUDGET)
+
+    def _deferred_check_up(self):
+        """Check the network and assignment state again once settled
+        after a fast resume. The full checkup plays the last channel
+        again, it only runs if the state changed meanwhile."""
+        state, self._check_up_state = self._check_up_state, None
+        if state is None:
+            log.info("Back in standby, deferred resume check dropped.")
+            return
+        main_hub = wuk.application.get('MainHub')
+        if main_hub.swimlane_enabled:
+            main_hub.update_access_point_and_swimlane(callback=lambda: None)
+        changes = resume_state_changes(state, capture_resume_state())
+        if not changes:
+            log.info("Resume state unchanged, full checkup skipped.")
+            return
+        log.info("Changed after resume: %s, running the full checkup.",
+                 ", ".join(changes))
+        wuk.application.get('RootPage').force_check_up(
+            refresh_front_pannel_on_play_failed)
+
+    def _begin_transition(self, name):
+        if self.timeline is not None:
+            log.warning("[STANDBY] %s interrupted by %s",
+                        self.timeline.name, name)
+            self._end_transition(None)
+        self.timeline = Timeline(name)
+        self.timeline.begin(name, category="transition")
+
+    def _end_transition(self, budget):
+        """Log the transition duration and its worst phase, dump its
+        timeline if enabled."""
+        timeline = self.timeline
+        if timeline is None:
+            return
+        self.timeline = None
+        total = timeline.end(timeline.name, category="transition")
+        worst = timeline.worst_leaf_span(exclude=(timeline.name,))
+        if worst is not None:
+            worst = "%s (%.3fs)" % worst
+        log.info("[STANDBY] %s done in %.3fs, worst phase: %s",
+                 timeline.name, total, worst)
+        if budget is not None and total > budget:
+            log.error("[STANDBY] %s over budget (%.3fs > %.3fs), worst "
+                      "phase: %s", timeline.name, total, budget, worst)
+        if STANDBY_TRACE_PATH is not None:
+            timeline.dump(STANDBY_TRACE_PATH.replace("%s", timeline.name))
+
+    def _begin_phase(self, name):
+        if self.timeline is not None:
+            self.timeline.begin(name, category="phase")
+
+    def _end_phase(self, name, **args):
+        if self.timeline is not None:
+            self.timeline.end(name, category="phase", **args)
+
+    @contextmanager
+    def _phase(self, name):
+        self._begin_phase(name)
+        try:
+            yield
+        finally:
+            self._end_phase(name)
 
     def disable_standby(self, callback=None):
         """ When called, this tells the power manager that the max state is
@@ -413,40 +655,9 @@ class Standby(object):
         # Allow android system to go into standby when the UI is ready
 
     def send_avr_on_standby(self):
-        try:
-            config = ConfigParser.ConfigParser()
-            config.read("/etc/params/stores/wystandby.cfg")
-            last_sleep_state = config.get("leon", "state")      #Exception in this line sends no AVR
-        except:
-            last_sleep_state = 0
-
-        power_cycle_avr_flag = False
         update_status = OCIDService().sw_update_state_get()
-
-        if update_status == SW_UPDATE_NAND_WRITE:
-            power_cycle_avr_flag = True
-            if last_sleep_state == 1:
-                power_cycle_header_list = ["TSU", "STBY", "STBY","NULL"]
-            else:
-                power_cycle_header_list = ["TSU", "POWEROFF", "STBY","NULL"]
-        else:
-            if last_sleep_state == 1:
-                power_cycle_avr_flag = True
-                power_cycle_header_list = ["STBY", "STBY", "STBY","NULL"]
-
-        sw_fw_element_list = ['NULL']*12
-        hdd_info_list = ['NULL']*19
-
-        if power_cycle_avr_flag == True:
-            #For NOR-NAND elements
-            nor_nand_info_list_null = ["NULL"]*12
-            if platform in ['v5', 'v4']:
-                hdd_info_list = hdd_info_parse()
-            if platform == "v5":
-                sw_fw_element_list = avr_software_firmware_info_args()
-
-            sw_fw_element_list.extend(nor_nand_info_list_null)
-            avr_tuple = tuple(power_cycle_header_list + sw_fw_element_list + hdd_info_list)
+        avr_tuple = StandbyInventory().power_cycle_avr(update_status)
+        if avr_tuple is not None:
             log.info("Sending TSU/Normal boot AVR")
             AVR().send("POWER-CYCLE", avr_tuple)
 
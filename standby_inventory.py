@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Standby inventory
+
+Data of the POWER-CYCLE AVR sent on standby entry. The last sleep state
+read from ``wystandby.cfg`` is cached until the file changes; the
+firmware and HDD identity fields are read once per boot, so the tail of
+the AVR tuple is assembled before the first standby.
+"""
+import os
+
+import ConfigParser
+
+from peewee.debug import GET_LOGGER
+from peewee.misc_utils import MetaSingleton
+
+from leon_mal.platform import platform
+
+from leon_app_tools.return_codes import SW_UPDATE_NAND_WRITE
+
+from adele_app.tools.utilities import hdd_info_parse
+from adele_app.tools.utilities import avr_software_firmware_info_args
+
+
+log = GET_LOGGER(__name__)
+
+WYSTANDBY_CFG = "/etc/params/stores/wystandby.cfg"
+
+
+class StandbyInventory(object):
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self, cfg_path=WYSTANDBY_CFG):
+        self.cfg_path = cfg_path
+        self._cfg_stamp = None
+        self._last_sleep_state = 0
+        #: Firmware, NOR/NAND and HDD fields of the POWER-CYCLE AVR.
+        self._inventory = None
+
+    def last_sleep_state(self):
+        """Return the ``leon.state`` value of ``wystandby.cfg``, parsed
+        again only when the file changed."""
+        try:
+            stat = os.stat(self.cfg_path)
+            stamp = (stat.st_mtime, stat.st_size, stat.st_ino)
+        except OSError:
+            stamp = None
+        if stamp is None or stamp != self._cfg_stamp:
+            self._cfg_stamp = stamp
+            try:
+                config = ConfigParser.ConfigParser()
+                config.read(self.cfg_path)
+                self._last_sleep_state = config.get("leon", "state")
+            except:
+                self._last_sleep_state = 0
+        return self._last_sleep_state
+
+    def inventory(self):
+        """Return the firmware and HDD fields, read once per boot."""
+        if self._inventory is None:
+            sw_fw_element_list = ['NULL']*12
+            hdd_info_list = ['NULL']*19
+            if platform in ['v5', 'v4']:
+                hdd_info_list = hdd_info_parse()
+            if platform == "v5":
+                sw_fw_element_list = avr_software_firmware_info_args()
+            #For NOR-NAND elements
+            nor_nand_info_list_null = ["NULL"]*12
+            self._inventory = tuple(list(sw_fw_element_list) +
+                                    nor_nand_info_list_null +
+                                    list(hdd_info_list))
+        return self._inventory
+
+    def prewarm(self):
+        """Read everything ahead of the standby entry."""
+        self.last_sleep_state()
+        self.inventory()
+
+    def power_cycle_avr(self, update_status):
+        """Return the POWER-CYCLE AVR tuple, ``None`` if none is due."""
+        last_sleep_state = self.last_sleep_state()
+        if update_status == SW_UPDATE_NAND_WRITE:
+            if last_sleep_state == 1:
+                power_cycle_header_list = ["TSU", "STBY", "STBY","NULL"]
+            else:
+                power_cycle_header_list = ["TSU", "POWEROFF", "STBY","NULL"]
+        elif last_sleep_state == 1:
+            power_cycle_header_list = ["STBY", "STBY", "STBY","NULL"]
+        else:
+            return None
+        return tuple(power_cycle_header_list) + self.inventory()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Startup profiler
+
+Enabled with ``STARTUP_PROFILE=1``: hooks ``__import__`` to record the
+cumulative and self time of each module import and times the blocks
+of :func:`adele_app.startup`. A JSON report is written for each stage
+(``startup`` when the view manager is started, ``boot`` at the end of
+the boot sequence) to ``STARTUP_PROFILE_REPORT`` where ``%s`` is
+replaced by the stage. The startup stage is checked against
+``STARTUP_BUDGET`` (seconds, optional).
+
+This module is imported before anything else by the package so it
+must only depend on the standard library at import time.
+
+Regression gate::
+
+    python startup_profile.py /tmp/startup_profile.startup.json 2.5
+"""
+import __builtin__
+import json
+import os
+import sys
+import time
+
+from contextlib import contextmanager
+
+
+ENABLED = os.getenv("STARTUP_PROFILE", "0").lower() in ("1", "y", "yes",
+                                                         "true")
+REPORT_PATH = os.getenv("STARTUP_PROFILE_REPORT",
+                        "/tmp/startup_profile.%s.json")
+try:
+    BUDGET = float(os.getenv("STARTUP_BUDGET", ""))
+except ValueError:
+    BUDGET = None
+
+# Number of modules logged by write_report().
+LOGGED_MODULES = 10
+
+
+class StartupProfiler(object):
+
+    def __init__(self):
+        self.origin = time.time()
+        self.enabled = False
+        #: Module name -> [cumulative seconds, self seconds].
+        self.modules = {}
+        #: (block name, seconds) in execution order.
+        self.blocks = []
+        #: Stages whose report exceeded their budget.
+        self.over_budget_stages = []
+        self._children = []
+        self._original_import = None
+
+    def install(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._original_import = __builtin__.__import__
+        __builtin__.__import__ = self._import
+
+    def uninstall(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        __builtin__.__import__ = self._original_import
+
+    def _candidates(self, name, globals, level):
+        """Return the names under which ``name`` may be found in
+        ``sys.modules``, in lookup order."""
+        if level == 0 or not globals or "__name__" not in globals:
+            return [name]
+        package = globals.get("__package__")
+        if not package:
+            package = globals["__name__"]
+            if "__path__" not in globals:
+                package = package.rpartition(".")[0]
+        if level > 0:
+            # Explicit relative import: strip level - 1 components.
+            if level > 1:
+                package = package.rsplit(".", level - 1)[0]
+            return ["%s.%s" % (package, name) if name else package]
+        # Implicit relative import, tried before the absolute one.
+        if not package:
+            return [name]
+        return ["%s.%s" % (package, name), name]
+
+    def _loaded_name(self, candidates):
+        # Failed implicit relative lookups leave a None in sys.modules.
+        for candidate in candidates:
+            if sys.modules.get(candidate) is not None:
+                return candidate
+        return None
+
+    def _import(self, name, globals=None, locals=None, fromlist=None,
+                level=-1):
+        candidates = self._candidates(name, globals, level)
+        loaded = self._loaded_name(candidates) is not None
+        start = time.time()
+        self._children.append(0.0)
+        try:
+            return self._original_import(name, globals, locals, fromlist,
+                                         level)
+        finally:
+            elapsed = time.time() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            if not loaded:
+                timings = self.modules.setdefault(
+                    self._loaded_name(candidates) or name, [0.0, 0.0])
+                timings[0] += elapsed
+                timings[1] += elapsed - children
+
+    @contextmanager
+    def block(self, name):
+        """Time a startup block."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.blocks.append((name, time.time() - start))
+
+    def report(self, stage, budget=None):
+        total = time.time() - self.origin
+        imports = sorted(self.modules.iteritems(),
+                         key=lambda item: item[1][1], reverse=True)
+        return {
+            "stage": stage,
+            "total": round(total, 6),
+            "budget": budget,
+            "over_budget": budget is not None and total > budget,
+            "over_budget_stages": list(self.over_budget_stages),
+            "blocks": [(name, round(duration, 6))
+                       for name, duration in self.blocks],
+            "imports": [{"module": name,
+                         "cumulative": round(cumulative, 6),
+                         "self": round(self_time, 6)}
+                        for name, (cumulative, self_time) in imports],
+        }
+
+    def write_report(self, stage, budget=None):
+        """Write and log the report if profiling is enabled.
+
+        Return ``False`` if ``budget`` (seconds) is exceeded.
+        """
+        if not self.enabled:
+            return True
+        from peewee.debug import GET_LOGGER
+        log = GET_LOGGER(__name__)
+
+        report = self.report(stage, budget)
+        if report["over_budget"]:
+            self.over_budget_stages.append(stage)
+            report["over_budget_stages"].append(stage)
+        path = REPORT_PATH.replace("%s", stage)
+        try:
+            with open(path, "w") as output:
+                json.dump(report, output, indent=1)
+        except (IOError, OSError), e:
+            log.warning("Cannot write startup profile to %r: %r", path, e)
+        log.info("Startup profile (%s): %.3fs, blocks: %s", stage,
+                 report["total"], ", ".join("%s=%.3fs" % block
+                                            for block in report["blocks"]))
+        for module in report["imports"][:LOGGED_MODULES]:
+            log.info("  import %(module)s: self %(self).3fs, "
+                     "cumulative %(cumulative).3fs", module)
+        if report["over_budget"]:
+            log.error("Startup budget exceeded: %.3fs > %.3fs",
+                      report["total"], budget)
+            return False
+        return True
+
+
+profiler = StartupProfiler()
+if ENABLED:
+    profiler.install()
+
+
+def check_budget(path, budget):
+    """Return ``True`` if the report in ``path`` fits in ``budget``."""
+    with open(path) as report_file:
+        report = json.load(report_file)
+    return report["total"] <= budget
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: %s REPORT BUDGET" % sys.argv[0])
+    sys.exit(0 if check_budget(sys.argv[1], float(sys.argv[2])) else 1)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Step graph
+
+Run initialization steps as soon as their prerequisites are done.
+Steps run on the main thread, each in its own :class:`Task` so the view
+manager can render in between. Blocking steps which touch neither the
+UI nor D-Bus (process spawns, file I/O) can run on a small worker
+thread pool instead. A step raising an exception fails, and the steps
+requiring it are skipped.
+"""
+import Queue
+import threading
+import time
+
+from peewee.debug import GET_LOGGER
+from peewee.notifier import Task, mainthread
+
+
+log = GET_LOGGER(__name__)
+
+PENDING, RUNNING, DONE = "pending", "running", "done"
+FAILED, SKIPPED = "failed", "skipped"
+# States in which a step will not run anymore.
+FINAL_STATES = (DONE, FAILED, SKIPPED)
+
+
+class StepGraphError(Exception):
+    pass
+
+
+class Step(object):
+
+    def __init__(self, name, func, requires=(), threaded=False):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.threaded = threaded
+        self.state = PENDING
+        self.cancelled = False
+        self.error = None
+        self.ready_at = None
+        self.started_at = None
+        self.ended_at = None
+
+    def __repr__(self):
+        return "<Step %s %s>" % (self.name, self.state)
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.ended_at is None:
+            return None
+        return self.ended_at - self.started_at
+
+    def run(self):
+        if self.cancelled:
+            return
+        self.started_at = time.time()
+        try:
+            self.func()
+        except Exception, e:
+            log.exception("Step %s failed: %r", self.name, e)
+            self.error = e
+        self.ended_at = time.time()
+
+
+class _WorkerPool(object):
+
+    """Daemon threads running blocking steps, started on first use."""
+
+    def __init__(self, size):
+        self.size = size
+        self._queue = Queue.Queue()
+        self._threads = []
+
+    def submit(self, step, done):
+        if not self._threads:
+            for i in range(self.size):
+                thread = threading.Thread(target=self._work,
+                                          name="step-worker-%d" % i)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put((step, done))
+
+    def stop(self):
+        for thread in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            step, done = item
+            step.run()
+            done(step)
+
+
+class StepGraph(object):
+
+    """Dependency graph of initialization steps.
+
+    :param name: name used in logs.
+    :param callback: called without argument once all steps are done.
+    :param timeline: optional :class:`adele_app.tracing.Timeline` in
+        which each step is recorded.
+    :param workers: number of threads running the threaded steps.
+    """
+
+    def __init__(self, name, callback=None, timeline=None, workers=2):
+        self.name = name
+        self.callback = callback
+        self.timeline = timeline
+        self.steps = {}
+        self.started_at = None
+        self.ended_at = None
+        self.cancelled = False
+        self._order = []
+        self._pool = _WorkerPool(workers)
+
+    @property
+    def succeeded(self):
+        """Whether every step ran without error."""
+        return all(step.state == DONE for step in self._order)
+
+    def add(self, name, func, requires=(), threaded=False):
+        """Add a step running ``func`` once ``requires`` steps are done.
+
+        Threaded steps must not touch the view manager, the notifier
+        nor D-Bus proxies and services, none of them is thread-safe.
+        """
+        if name in self.steps:
+            raise StepGraphError("Step %r already defined" % name)
+        step = Step(name, func, requires, threaded)
+        self.steps[name] = step
+        self._order.append(step)
+        return step
+
+    def _validate(self):
+        visiting, visited = set(), set()
+
+        def _visit(step):
+            if step.name in visited:
+                return
+            if step.name in visiting:
+                raise StepGraphError("Cycle on step %r" % step.name)
+            visiting.add(step.name)
+            for name in step.requires:
+                if name not in self.steps:
+                    raise StepGraphError("Step %r requires unknown step %r"
+                                         % (step.name, name))
+                _visit(self.steps[name])
+            visiting.discard(step.name)
+            visited.add(step.name)
+
+        for step in self._order:
+            _visit(step)
+
+    def run(self):
+        self._validate()
+        self.started_at = time.time()
+        log.info("Running %s steps: %s", self.name,
+                 ", ".join(step.name for step in self._order))
+        self._schedule()
+
+    def cancel(self):
+        """Stop the graph: steps not started yet are dropped and the
+        callback is not called. Running steps complete but their
+        dependents do not run."""
+        if self.cancelled or self.ended_at is not None:
+            return
+        log.info("%s steps cancelled", self.name)
+        self.cancelled = True
+        self.callback = None
+        for step in self._order:
+            step.cancelled = True
+        self._pool.stop()
+
+    def _schedule(self):
+        # Steps are not sorted, loop until skipped steps are propagated
+        # to their dependents.
+        skipped = True
+        while skipped:
+            skipped = False
+            for step in self._order:
+                if step.state != PENDING:
+                    continue
+                missing = [name for name in step.requires
+                           if self.steps[name].state in (FAILED, SKIPPED)]
+                if missing:
+                    self._skip(step, missing)
+                    skipped = True
+                elif all(self.steps[name].state == DONE
+                         for name in step.requires):
+                    step.state = RUNNING
+                    step.ready_at = time.time()
+                    if step.threaded:
+                        self._pool.submit(step, self._thread_step_done)
+                    else:
+                        self._run_on_main_thread(step)
+        if self.ended_at is None and all(step.state in FINAL_STATES
+                                         for step in self._order):
+            self._finish()
+
+    def _skip(self, step, missing):
+        log.error("Step %s skipped, %s not done", step.name,
+                  ", ".join(missing))
+        step.state = SKIPPED
+        if self.timeline is not None:
+            self.timeline.instant(step.name, category="skipped",
+                                  missing=missing)
+
+    def _run_on_main_thread(self, step):
+        def _run():
+            step.run()
+            self._step_done(step)
+        Task(_run).start()
+
+    @mainthread
+    def _thread_step_done(self, step):
+        self._step_done(step)
+
+    def _step_done(self, step):
+        if self.cancelled:
+            return
+        step.state = DONE if step.error is None else FAILED
+        if self.timeline is not None:
+            self.timeline.complete(
+                step.name, step.started_at, step.ended_at,
+                category="thread" if step.threaded else "main",
+                queued=round(step.started_at - step.ready_at, 6),
+                failed=step.error is not None)
+        self._schedule()
+
+    def _finish(self):
+        self.ended_at = time.time()
+        self._pool.stop()
+        path = self.critical_path()
+        failed = [step.name for step in self._order if step.state != DONE]
+        if failed:
+            log.error("%s steps not done: %s", self.name, ", ".join(failed))
+        log.info("%s steps done in %.3fs, critical path: %s",
+                 self.name, self.ended_at - self.started_at,
+                 " -> ".join("%s (%.3fs)" % (step.name, step.duration)
+                             for step in path))
+        if self.timeline is not None:
+            self.timeline.metadata["%s_critical_path" % self.name] = [
+                (step.name, round(step.duration, 6)) for step in path]
+        if self.callback is not None:
+            self.callback()
+
+    def critical_path(self):
+        """Return the chain of steps which determined the graph duration.
+
+        Starting from the last step to end, walk back through the
+        prerequisite that ended last.
+        """
+        done = [step for step in self._order if step.ended_at is not None]
+        if not done:
+            return []
+        step = max(done, key=lambda step: step.ended_at)
+        path = [step]
+        while step.requires:
+            step = max((self.steps[name] for name in step.requires),
+                       key=lambda step: step.ended_at)
+            path.append(step)
+        path.reverse()
+        return path
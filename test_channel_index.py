@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.channel_index."""
+import unittest
+
+from adele_app.channel_index import ChannelList
+
+
+def channel(id, lcn, subscribed=True, resolution="SD", title=None):
+    return {"id": id, "lcn": lcn, "valid_subscription": subscribed,
+            "resolution": resolution, "title": title or id}
+
+
+class TestChannelListMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.channels = ChannelList("test")
+        self.channels.merge([channel("c3", 3), channel("c1", 1),
+                             channel("c2", 2)])
+
+    def _lcn_order(self):
+        return [entry.id for entry in self.channels.entries()]
+
+    def test_first_merge(self):
+        self.assertTrue(self.channels.ready)
+        self.assertEqual(len(self.channels), 3)
+        self.assertEqual(self._lcn_order(), ["c1", "c2", "c3"])
+        self.assertEqual(self.channels.get_by_lcn(2)["id"], "c2")
+        self.assertEqual(self.channels.get_by_lcn(4), None)
+
+    def test_same_list_is_not_a_change(self):
+        # New item instances with the same fields.
+        changed = self.channels.merge([channel("c1", 1), channel("c2", 2),
+                                       channel("c3", 3)])
+        self.assertEqual(changed, 0)
+
+    def test_unindexed_fields_are_not_a_change(self):
+        changed = self.channels.merge([channel("c1", 1, title="News"),
+                                       channel("c2", 2), channel("c3", 3)])
+        self.assertEqual(changed, 0)
+        # The item just fetched is the one held.
+        self.assertEqual(self.channels.get("c1")["title"], "News")
+
+    def test_changed_fields(self):
+        changed = self.channels.merge([channel("c1", 1, resolution="HD"),
+                                       channel("c2", 2, subscribed=False),
+                                       channel("c3", 3)])
+        self.assertEqual(changed, 2)
+        self.assertEqual(self.channels.get("c1")["resolution"], "HD")
+
+    def test_added_removed_and_moved(self):
+        changed = self.channels.merge([channel("c1", 5), channel("c3", 3),
+                                       channel("c4", 4)])
+        # c1 moved, c4 added, c2 removed.
+        self.assertEqual(changed, 3)
+        self.assertEqual(self._lcn_order(), ["c3", "c4", "c1"])
+        self.assertEqual(self.channels.get("c2"), None)
+        self.assertEqual(self.channels.get_by_lcn(1), None)
+        self.assertEqual(self.channels.get_by_lcn(5)["id"], "c1")
+
+
+class TestChannelListFind(unittest.TestCase):
+
+    def setUp(self):
+        self.channels = ChannelList("test")
+
+    def test_not_built(self):
+        self.assertEqual(self.channels.find(), None)
+
+    def test_find(self):
+        self.channels.merge([channel("hd", 1, resolution="HD"),
+                             channel("sd", 2)])
+        sd_only = lambda item: item["resolution"] == "SD"
+        self.assertEqual(self.channels.find()["id"], "hd")
+        self.assertEqual(self.channels.find(predicate=sd_only)["id"], "sd")
+        self.assertEqual(self.channels.find("hd")["id"], "hd")
+        self.assertEqual(self.channels.find("hd", predicate=sd_only), None)
+        self.assertEqual(self.channels.find("missing"), None)
+
+
+class TestChannelListNeighbours(unittest.TestCase):
+
+    def setUp(self):
+        self.channels = ChannelList("test")
+        self.channels.merge([channel("c%d" % lcn, lcn)
+                             for lcn in xrange(1, 6)])
+
+    def test_closest_first(self):
+        self.assertEqual(self.channels.neighbours("c3", 2),
+                         ["c4", "c2", "c5", "c1"])
+
+    def test_list_ends(self):
+        self.assertEqual(self.channels.neighbours("c1", 2), ["c2", "c3"])
+        self.assertEqual(self.channels.neighbours("c5", 1), ["c4"])
+
+    def test_unknown_channel(self):
+        self.assertEqual(self.channels.neighbours("missing", 2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.compact_model."""
+import unittest
+
+from adele_app.compact_model import (ProgrammeTable, benchmark,
+                                     programmes_from_items)
+
+
+def programme(id, channel_id, start_time, end_time, title=u"Title"):
+    return {"id": id, "channel_id": channel_id, "start_time": start_time,
+            "end_time": end_time, "title": title, "genre": u"News"}
+
+
+class TestProgrammeTableBetween(unittest.TestCase):
+
+    def setUp(self):
+        # A long programme on A, short ones on B.
+        self.table = programmes_from_items([
+            programme("a", "A", 0.0, 100.0),
+            programme("b1", "B", 10.0, 20.0),
+            programme("b2", "B", 20.0, 30.0),
+        ])
+
+    def _ids(self, *args, **kwargs):
+        return [row.id for row in self.table.between(*args, **kwargs)]
+
+    def test_long_programme_of_another_channel(self):
+        self.assertEqual(self._ids(50.0, 60.0), ["a"])
+        self.assertEqual(self._ids(25.0, 26.0), ["a", "b2"])
+
+    def test_half_open_window(self):
+        self.assertEqual(self._ids(20.0, 21.0), ["a", "b2"])
+        self.assertEqual(self._ids(5.0, 10.0), ["a"])
+        self.assertEqual(self._ids(100.0, 200.0), [])
+
+    def test_one_channel(self):
+        self.assertEqual(self._ids(0.0, 100.0, channel_id="B"),
+                         ["b1", "b2"])
+        self.assertEqual(self._ids(50.0, 60.0, channel_id="B"), [])
+        self.assertEqual(self._ids(0.0, 100.0, channel_id="C"), [])
+
+    def test_overlapping_programmes_of_one_channel(self):
+        # A programme spanning the next ones of its own channel.
+        self.table.append("b0", "B", 0.0, 40.0, u"Marathon")
+        self.assertEqual(self._ids(35.0, 36.0, channel_id="B"), ["b0"])
+        self.assertEqual(self._ids(25.0, 26.0, channel_id="B"),
+                         ["b0", "b2"])
+
+    def test_rows(self):
+        row = self.table.between(25.0, 26.0, channel_id="B")[0]
+        self.assertEqual((row.id, row.channel_id, row.start_time,
+                          row.end_time, row.title, row.genre),
+                         ("b2", "B", 20.0, 30.0, u"Title", u"News"))
+
+    def test_remove_channel(self):
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.remove_channel("B"), 2)
+        self.assertEqual(self.table.remove_channel("B"), 0)
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self._ids(0.0, 100.0), ["a"])
+
+
+class TestProgrammeTable(unittest.TestCase):
+
+    def test_strings_are_shared_per_channel(self):
+        table = ProgrammeTable()
+        table.append("1", "A", 0.0, 10.0, u"%s" % u"News", u"%s" % u"Info")
+        table.append("2", "A", 10.0, 20.0, u"%s" % u"News", u"%s" % u"Info")
+        channel = table.channels["A"]
+        self.assertTrue(channel.titles[0] is channel.titles[1])
+        self.assertTrue(channel.genres[0] is channel.genres[1])
+
+    def test_out_of_order_append(self):
+        table = ProgrammeTable()
+        table.append("2", "A", 10.0, 20.0, u"Second")
+        table.append("1", "A", 0.0, 10.0, u"First")
+        self.assertEqual([row.id for row in table], ["1", "2"])
+
+    def test_benchmark(self):
+        sizes = benchmark(channels=10, programmes=200)
+        self.assertTrue(sizes["programme_table"] < sizes["programme_items"])
+        self.assertTrue(sizes["channel_records"] < sizes["channel_items"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.epg_prefetch.EpgStore."""
+import unittest
+
+from adele_app.epg_prefetch import EpgStore
+
+
+def programmes(channel_id, count, start=0.0, duration=10.0):
+    return [{"id": "%s_%d" % (channel_id, index),
+             "channel_id": channel_id,
+             "start_time": start + index * duration,
+             "end_time": start + (index + 1) * duration,
+             "title": u"Title %d" % index}
+            for index in xrange(count)]
+
+
+class TestEpgStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = EpgStore(max_programmes=10)
+
+    def test_resident_window(self):
+        self.store.put("A", 0.0, 40.0, programmes("A", 4))
+        self.assertTrue(self.store.covers("A", 10.0, 40.0))
+        self.assertFalse(self.store.covers("A", 10.0, 50.0))
+        self.assertEqual([row.id for row in self.store.get("A", 15.0, 25.0)],
+                         ["A_1", "A_2"])
+        self.assertEqual(self.store.get("A", 0.0, 50.0), None)
+        self.assertEqual(self.store.get("B", 0.0, 10.0), None)
+
+    def test_put_replaces_the_channel_window(self):
+        self.store.put("A", 0.0, 40.0, programmes("A", 4))
+        self.store.put("A", 20.0, 60.0, programmes("A", 4, start=20.0))
+        self.assertEqual(len(self.store), 4)
+        self.assertFalse(self.store.covers("A", 0.0, 10.0))
+        self.assertEqual([row.id for row in self.store.get("A", 20.0, 30.0)],
+                         ["A_0"])
+
+    def test_least_recently_used_channel_evicted(self):
+        self.store.put("A", 0.0, 40.0, programmes("A", 4))
+        self.store.put("B", 0.0, 40.0, programmes("B", 4))
+        # A read last, B is the least recently used.
+        self.store.get("A", 0.0, 10.0)
+        self.store.put("C", 0.0, 40.0, programmes("C", 4))
+        self.assertEqual(len(self.store), 8)
+        self.assertTrue(self.store.covers("A", 0.0, 40.0))
+        self.assertFalse(self.store.covers("B", 0.0, 40.0))
+        self.assertTrue(self.store.covers("C", 0.0, 40.0))
+
+    def test_last_channel_kept_over_the_cap(self):
+        self.store.put("A", 0.0, 120.0, programmes("A", 12))
+        self.assertEqual(len(self.store), 12)
+        self.assertTrue(self.store.covers("A", 0.0, 120.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
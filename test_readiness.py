@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.readiness, against a fake bus and a fake clock."""
+import unittest
+
+from adele_app import readiness
+from adele_app.readiness import (NameOwnerWatcher, PagesClearedLatch,
+                                 ReadinessSet, ViewStatesWatcher,
+                                 notify_view_states, wait_for_bus_name)
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeTask(object):
+
+    """Task stepped by the test instead of the notifier."""
+
+    started = []
+
+    def __init__(self, func):
+        self.func = func
+        self.init_delay = None
+
+    def start(self, init_delay=0, **kwargs):
+        self.init_delay = init_delay
+        FakeTask.started.append(self)
+
+
+class FakeProviderBus(object):
+
+    """Bus on which names get an owner, announced the way the
+    ``NameOwnerChanged`` signal is."""
+
+    def __init__(self):
+        self.owners = {}
+
+    def is_provider_connected(self, name):
+        return name in self.owners
+
+    has_owner = is_provider_connected
+
+    def appear(self, name):
+        self.owners[name] = ":1.%d" % (len(self.owners) + 1)
+        NameOwnerWatcher()._dispatch(name, self.owners[name])
+
+
+class ReadinessTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = FakeProviderBus()
+        self.clock = FakeClock()
+        FakeTask.started = []
+        watcher = NameOwnerWatcher()
+        watcher._listeners = []
+        watcher._subscribe = lambda: True
+        watcher.has_owner = self.bus.has_owner
+        self._time, readiness.time = readiness.time, self.clock
+        self._task, readiness.Task = readiness.Task, FakeTask
+
+    def tearDown(self):
+        readiness.time = self._time
+        readiness.Task = self._task
+        watcher = NameOwnerWatcher()
+        del watcher._subscribe
+        del watcher.has_owner
+        watcher._listeners = []
+        watcher._dbus = None
+
+    def _run_tasks(self):
+        """Step the started generator tasks once, drop the ended ones."""
+        for task in list(FakeTask.started):
+            try:
+                task.func.next()
+            except StopIteration:
+                FakeTask.started.remove(task)
+
+
+class TestProviderReadiness(ReadinessTestCase):
+
+    """Providers waited for as BootSequence.loop_check_middleware does."""
+
+    def _wait_for_providers(self, providers):
+        self.calls = []
+        self.readiness = ReadinessSet(
+            providers, callback=lambda: self.calls.append(True),
+            name="middleware")
+
+        def _name_owner_changed(name, new_owner):
+            self.readiness.refresh(self.bus.is_provider_connected)
+        NameOwnerWatcher().register(_name_owner_changed)
+
+    def test_ready_once_the_last_provider_appears(self):
+        self._wait_for_providers(["mediarenderer", "ocid", "pvr"])
+        self.bus.appear("ocid")
+        self.bus.appear("pvr")
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.readiness.pending, set(["mediarenderer"]))
+        self.bus.appear("mediarenderer")
+        self.assertEqual(self.calls, [True])
+        self.assertTrue(self.readiness.done)
+        # Later owners do not call back again.
+        self.bus.appear("storage")
+        self.assertEqual(self.calls, [True])
+
+    def test_other_bus_names_are_ignored(self):
+        self._wait_for_providers(["ocid"])
+        self.bus.appear("com.wyplay.ui")
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.readiness.pending, set(["ocid"]))
+
+    def test_poll_catches_a_missed_notification(self):
+        self._wait_for_providers(["ocid", "pvr"])
+        self.bus.owners["ocid"] = self.bus.owners["pvr"] = ":1.1"
+        self.assertEqual(self.calls, [])
+        self.assertTrue(self.readiness.refresh(
+            self.bus.is_provider_connected))
+        self.assertEqual(self.calls, [True])
+
+    def test_timed_out_wait_does_not_call_back(self):
+        self._wait_for_providers(["ocid", "pvr"])
+        self.bus.appear("ocid")
+        # Watchdog expired.
+        self.readiness.cancel()
+        self.bus.appear("pvr")
+        self.assertEqual(self.calls, [])
+        self.assertFalse(self.readiness.done)
+
+
+class TestWaitForBusName(ReadinessTestCase):
+
+    def setUp(self):
+        ReadinessTestCase.setUp(self)
+        self.results = []
+
+    def _wait(self):
+        return wait_for_bus_name("com.wyplay.oci", self.results.append,
+                                 timeout=3.0, poll_period=0.5)
+
+    def test_name_already_owned(self):
+        self.bus.owners["com.wyplay.oci"] = ":1.1"
+        self._wait()
+        self.assertEqual(self.results, [True])
+        self.assertEqual(FakeTask.started, [])
+
+    def test_name_owner_changed(self):
+        self._wait()
+        self.bus.appear("com.wyplay.oci")
+        self.assertEqual(self.results, [True])
+        self.assertEqual(NameOwnerWatcher()._listeners, [])
+        # The poll ends without calling back again.
+        self._run_tasks()
+        self.assertEqual(self.results, [True])
+
+    def test_timeout_runs_from_the_start(self):
+        self._wait()
+        # First poll after poll_period.
+        self.clock.now += 0.5
+        self._run_tasks()
+        self.clock.now += 2.0
+        self._run_tasks()
+        self.assertEqual(self.results, [])
+        self.clock.now += 0.5
+        self._run_tasks()
+        self.assertEqual(self.results, [False])
+        self.assertEqual(NameOwnerWatcher()._listeners, [])
+
+    def test_cancel(self):
+        waiter = self._wait()
+        waiter.cancel()
+        self.bus.appear("com.wyplay.oci")
+        self.clock.now += 3.0
+        self._run_tasks()
+        self.assertEqual(self.results, [])
+
+
+class FakePage(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.view_states = set(["ready"])
+
+    def clear(self, notify=True):
+        self.view_states.discard("ready")
+        if notify:
+            notify_view_states(self)
+
+    def __repr__(self):
+        return "<FakePage %s>" % self.name
+
+
+class TestPagesClearedLatch(ReadinessTestCase):
+
+    def setUp(self):
+        ReadinessTestCase.setUp(self)
+        ViewStatesWatcher()._listeners = []
+        self.results = []
+        self.pages = [FakePage("menu"), FakePage("browser")]
+
+    def tearDown(self):
+        ViewStatesWatcher()._listeners = []
+        ReadinessTestCase.tearDown(self)
+
+    def _start(self):
+        self.latch = PagesClearedLatch(self.pages, self.results.append,
+                                       timeout=1.0, name="test_pages")
+        self.latch.start()
+
+    def test_pages_already_cleared(self):
+        for page in self.pages:
+            page.clear(notify=False)
+        self._start()
+        self.assertEqual(self.results, [[]])
+        self.assertEqual(FakeTask.started, [])
+
+    def test_released_on_the_last_notification(self):
+        self._start()
+        self.clock.now += 0.01
+        self.pages[0].clear()
+        self.assertEqual(self.results, [])
+        self.clock.now += 0.02
+        self.pages[1].clear()
+        # No poll needed.
+        self.assertEqual(self.results, [[]])
+        self.assertAlmostEqual(self.latch.cleared_after[self.pages[1]], 0.03)
+        self.assertEqual(ViewStatesWatcher()._listeners, [])
+        self._run_tasks()
+        self.assertEqual(self.results, [[]])
+
+    def test_poll_fallback_is_not_faster_than_50ms(self):
+        self._start()
+        self.assertEqual(FakeTask.started[0].init_delay, 0.05)
+        self.pages[0].clear(notify=False)
+        self.pages[1].clear(notify=False)
+        self._run_tasks()
+        self.assertEqual(self.results, [[]])
+
+    def test_deadline_reports_the_late_pages(self):
+        self._start()
+        self.pages[0].clear()
+        self._run_tasks()
+        self.assertEqual(self.results, [])
+        self.clock.now += 1.0
+        self._run_tasks()
+        self.assertEqual(self.results, [[self.pages[1]]])
+        # Cleared too late, not reported again.
+        self.pages[1].clear()
+        self.assertEqual(self.results, [[self.pages[1]]])
+
+    def test_cancel(self):
+        self._start()
+        self.latch.cancel()
+        for page in self.pages:
+            page.clear()
+        self.assertEqual(self.results, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
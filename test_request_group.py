@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.request_group."""
+import unittest
+
+from adele_app import request_group
+from adele_app.request_group import RequestGroup
+from adele_app.tracing import Timeline
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 10.0
+
+    def time(self):
+        return self.now
+
+
+class FakeTask(object):
+
+    """Task run by the test instead of the notifier."""
+
+    started = []
+
+    def __init__(self, func):
+        self.func = func
+
+    def start(self, init_delay=0, **kwargs):
+        FakeTask.started.append((self.func, init_delay))
+
+
+class FakeRequest(object):
+
+    def __init__(self, succeeded=True):
+        self._succeeded = succeeded
+
+    def is_succeeded(self):
+        return self._succeeded
+
+
+class TestRequestGroup(unittest.TestCase):
+
+    def setUp(self):
+        FakeTask.started = []
+        self.clock = FakeClock()
+        self._task, request_group.Task = request_group.Task, FakeTask
+        self._time, request_group.time = request_group.time, self.clock
+        self.results = []
+        self.timeline = Timeline("test", clock=self.clock.time)
+        self.group = RequestGroup(self.results.append, timeout=5.0,
+                                  name="test", timeline=self.timeline)
+
+    def tearDown(self):
+        request_group.Task = self._task
+        request_group.time = self._time
+
+    def _expire(self):
+        for func, init_delay in FakeTask.started:
+            self.clock.now += init_delay
+            func()
+
+    def test_done_once_every_branch_completed(self):
+        close = self.group.branch("close")
+        home = self.group.branch("home")
+        self.group.start()
+        self.clock.now += 0.5
+        home(FakeRequest())
+        self.assertEqual(self.results, [])
+        self.assertEqual(self.group.pending, ["close"])
+        self.clock.now += 1.0
+        close(FakeRequest())
+        self.assertEqual(self.results, [self.group])
+        self.assertTrue(self.group.succeeded)
+        self.assertEqual(self.group.latencies, {"home": 0.5, "close": 1.5})
+        self.assertEqual(self.timeline.durations["close"], (1, 1.5))
+        # The timeout does not call back again.
+        self._expire()
+        self.assertEqual(self.results, [self.group])
+        self.assertFalse(self.group.timed_out)
+
+    def test_failed_branch(self):
+        close = self.group.branch("close")
+        home = self.group.branch("home")
+        self.group.start()
+        close(FakeRequest(succeeded=False))
+        home(FakeRequest())
+        self.assertEqual(self.results, [self.group])
+        self.assertFalse(self.group.succeeded)
+
+    def test_branches_completed_before_start(self):
+        self.group.branch("close")(FakeRequest())
+        self.assertEqual(self.results, [])
+        self.group.start()
+        self.assertEqual(self.results, [self.group])
+
+    def test_no_branch(self):
+        self.group.start()
+        self.assertEqual(self.results, [self.group])
+        self.assertTrue(self.group.succeeded)
+
+    def test_timeout(self):
+        close = self.group.branch("close")
+        self.group.branch("home")(FakeRequest())
+        self.group.start()
+        self._expire()
+        self.assertEqual(self.results, [self.group])
+        self.assertTrue(self.group.timed_out)
+        self.assertFalse(self.group.succeeded)
+        self.assertEqual(self.group.pending, ["close"])
+        # A late branch is recorded, the group is not called back again.
+        close(FakeRequest())
+        self.assertEqual(self.results, [self.group])
+        self.assertEqual(self.group.latencies["close"], 5.0)
+
+    def test_cancel(self):
+        close = self.group.branch("close")
+        self.group.start()
+        self.group.cancel()
+        close(FakeRequest())
+        self._expire()
+        self.assertEqual(self.results, [])
+        self.assertTrue(self.group.cancelled)
+
+    def test_duplicate_branch(self):
+        self.group.branch("close")
+        self.assertRaises(ValueError, self.group.branch, "close")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.resume_state, on a fake /sys/class/net."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from adele_app import resume_state
+from adele_app.resume_state import resume_state_changes
+
+
+ROUTES = """Iface\tDestination\tGateway\tFlags
+eth0\t0000A8C0\t00000000\t0001
+eth0\t00000000\t0100A8C0\t0003
+"""
+
+
+class TestResumeState(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self._net = resume_state.SYS_CLASS_NET
+        self._route = resume_state.PROC_NET_ROUTE
+        resume_state.SYS_CLASS_NET = os.path.join(self.root, "net")
+        resume_state.PROC_NET_ROUTE = os.path.join(self.root, "route")
+        with open(resume_state.PROC_NET_ROUTE, "w") as routes:
+            routes.write(ROUTES)
+        self._link("lo", operstate="unknown")
+        self._link("eth0", carrier_changes="2")
+
+    def tearDown(self):
+        resume_state.SYS_CLASS_NET = self._net
+        resume_state.PROC_NET_ROUTE = self._route
+        shutil.rmtree(self.root)
+
+    def _link(self, interface, operstate="up", carrier="1",
+              address="00:11:22:33:44:55", carrier_changes="2"):
+        path = os.path.join(resume_state.SYS_CLASS_NET, interface)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for name, value in (("operstate", operstate), ("carrier", carrier),
+                            ("address", address),
+                            ("carrier_changes", carrier_changes)):
+            with open(os.path.join(path, name), "w") as attribute:
+                attribute.write("%s\n" % value)
+
+    def _state(self):
+        return {"links": resume_state._links(),
+                "default_route": resume_state._default_route(),
+                "boot_status": 0, "sw_update": 0}
+
+    def test_links_and_default_route(self):
+        state = self._state()
+        self.assertEqual(state["links"],
+                         {"eth0": ("up", "1", "00:11:22:33:44:55")})
+        self.assertEqual(state["default_route"], ("eth0", "0100A8C0"))
+
+    def test_unchanged(self):
+        self.assertEqual(resume_state_changes(self._state(), self._state()),
+                         [])
+
+    def test_cable_plugged_back_is_unchanged(self):
+        before = self._state()
+        self._link("eth0", carrier_changes="4")
+        self.assertEqual(resume_state_changes(before, self._state()), [])
+
+    def test_link_down(self):
+        before = self._state()
+        self._link("eth0", operstate="down", carrier="0")
+        self.assertEqual(resume_state_changes(before, self._state()),
+                         ["links"])
+
+    def test_new_interface(self):
+        before = self._state()
+        self._link("wlan0")
+        self.assertEqual(resume_state_changes(before, self._state()),
+                         ["links"])
+
+    def test_assignment_changed(self):
+        before = self._state()
+        after = dict(before, boot_status=1)
+        self.assertEqual(resume_state_changes(before, after), ["boot_status"])
+
+    def test_unknown_entries_count_as_changed(self):
+        before = dict(self._state(), sw_update=None)
+        self.assertEqual(resume_state_changes(before, before), ["sw_update"])
+
+
+if __name__ == "__main__":
+    unittest.main()
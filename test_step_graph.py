@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.step_graph, main thread steps on a fake loop."""
+import unittest
+
+from adele_app import step_graph
+from adele_app.step_graph import (StepGraph, StepGraphError, DONE, FAILED,
+                                  SKIPPED, PENDING)
+from adele_app.tracing import Timeline
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        return self.now
+
+
+class FakeTask(object):
+
+    """Task queued until the test runs the loop."""
+
+    queue = []
+
+    def __init__(self, func):
+        self.func = func
+
+    def start(self, *args, **kwargs):
+        FakeTask.queue.append(self.func)
+
+
+def run_loop():
+    while FakeTask.queue:
+        FakeTask.queue.pop(0)()
+
+
+class TestStepGraph(unittest.TestCase):
+
+    def setUp(self):
+        FakeTask.queue = []
+        self.clock = FakeClock()
+        self._task, step_graph.Task = step_graph.Task, FakeTask
+        self._time, step_graph.time = step_graph.time, self.clock
+        self.ran = []
+        self.finished = []
+        self.graph = StepGraph(
+            "test", callback=lambda: self.finished.append(True),
+            timeline=Timeline("test", clock=self.clock.time))
+
+    def tearDown(self):
+        step_graph.Task = self._task
+        step_graph.time = self._time
+
+    def _step(self, name, duration=0.0, error=None):
+        def _run():
+            self.ran.append(name)
+            self.clock.now += duration
+            if error is not None:
+                raise error
+        return _run
+
+    def _add(self, name, requires=(), duration=0.0, error=None):
+        self.graph.add(name, self._step(name, duration, error), requires)
+
+    def test_steps_run_after_their_requirements(self):
+        self._add("d", requires=("b", "c"))
+        self._add("b", requires=("a",))
+        self._add("c", requires=("a",))
+        self._add("a")
+        self.graph.run()
+        run_loop()
+        self.assertEqual(self.ran[0], "a")
+        self.assertEqual(sorted(self.ran[1:3]), ["b", "c"])
+        self.assertEqual(self.ran[3], "d")
+        self.assertEqual(self.finished, [True])
+        self.assertTrue(self.graph.succeeded)
+
+    def test_independent_steps_are_started_together(self):
+        self._add("a")
+        self._add("b")
+        self._add("c", requires=("a",))
+        self.graph.run()
+        # a and b are both queued before either ran.
+        self.assertEqual(len(FakeTask.queue), 2)
+        self.assertEqual(self.ran, [])
+        run_loop()
+        self.assertEqual(self.finished, [True])
+
+    def test_failed_step_skips_its_dependents(self):
+        self._add("poster_servers", error=ValueError("no server"))
+        self._add("root_page", requires=("poster_servers",))
+        self._add("top_pages", requires=("root_page",))
+        self._add("language")
+        self.graph.run()
+        run_loop()
+        steps = self.graph.steps
+        self.assertEqual(steps["poster_servers"].state, FAILED)
+        self.assertEqual(steps["root_page"].state, SKIPPED)
+        self.assertEqual(steps["top_pages"].state, SKIPPED)
+        self.assertEqual(steps["language"].state, DONE)
+        self.assertEqual(sorted(self.ran), ["language", "poster_servers"])
+        # The graph still ends, but did not succeed.
+        self.assertEqual(self.finished, [True])
+        self.assertFalse(self.graph.succeeded)
+        skipped = [event["name"] for event in self.graph.timeline.events
+                   if event["cat"] == "skipped"]
+        self.assertEqual(sorted(skipped), ["root_page", "top_pages"])
+
+    def test_critical_path(self):
+        self._add("a", duration=1.0)
+        # c runs first on the loop, b ends last.
+        self._add("c", requires=("a",), duration=1.0)
+        self._add("b", requires=("a",), duration=3.0)
+        self._add("d", requires=("b", "c"), duration=1.0)
+        self.graph.run()
+        run_loop()
+        self.assertEqual([step.name for step in self.graph.critical_path()],
+                         ["a", "b", "d"])
+        self.assertEqual(
+            self.graph.timeline.metadata["test_critical_path"],
+            [("a", 1.0), ("b", 3.0), ("d", 1.0)])
+
+    def test_cancel_drops_the_pending_steps(self):
+        self._add("a")
+        self._add("b", requires=("a",))
+        self.graph.run()
+        self.graph.cancel()
+        run_loop()
+        self.assertEqual(self.ran, [])
+        self.assertEqual(self.graph.steps["b"].state, PENDING)
+        self.assertEqual(self.finished, [])
+
+    def test_duplicate_step(self):
+        self._add("a")
+        self.assertRaises(StepGraphError, self._add, "a")
+
+    def test_unknown_requirement(self):
+        self._add("a", requires=("missing",))
+        self.assertRaises(StepGraphError, self.graph.run)
+
+    def test_cycle(self):
+        self._add("a", requires=("b",))
+        self._add("b", requires=("a",))
+        self.assertRaises(StepGraphError, self.graph.run)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Tests of adele_app.zap_pipeline."""
+import unittest
+
+from adele_app.zap_pipeline import ZapPipeline
+
+
+class TestZapPipeline(unittest.TestCase):
+
+    def setUp(self):
+        ZapPipeline._current = None
+        self.steps = []
+        self.results = []
+        self.resolutions = []
+
+    def _pipeline(self):
+        def _resolve(callback):
+            self.steps.append("resolve")
+            self.resolutions.append(callback)
+
+        def _prepare():
+            self.steps.append("prepare")
+            return "tv_page"
+
+        def _zap(channel, prepared):
+            self.steps.append(("zap", channel, prepared))
+
+        return ZapPipeline(_resolve, _prepare, _zap,
+                           callback=self.results.append)
+
+    def test_prepared_while_resolving(self):
+        self._pipeline().start()
+        self.assertEqual(self.steps, ["resolve", "prepare"])
+        self.resolutions[0]("channel")
+        self.assertEqual(self.steps[-1], ("zap", "channel", "tv_page"))
+        self.assertEqual(self.results, [True])
+        self.assertEqual(ZapPipeline._current, None)
+
+    def test_synchronous_resolution(self):
+        pipeline = self._pipeline()
+        pipeline._resolve = lambda callback: callback("channel")
+        pipeline.start()
+        self.assertEqual(self.steps, ["prepare",
+                                      ("zap", "channel", "tv_page")])
+        self.assertEqual(self.results, [True])
+
+    def test_failed_resolution_does_not_zap(self):
+        self._pipeline().start()
+        self.resolutions[0](None)
+        self.assertEqual(self.steps, ["resolve", "prepare"])
+        self.assertEqual(self.results, [False])
+
+    def test_synchronous_failure_is_not_prepared(self):
+        pipeline = self._pipeline()
+        pipeline._resolve = lambda callback: callback(None)
+        pipeline.start()
+        self.assertEqual(self.steps, [])
+        self.assertEqual(self.results, [False])
+
+    def test_last_zap_key_wins(self):
+        self._pipeline().start()
+        self._pipeline().start()
+        self.assertEqual(self.results, [False])
+        # The first resolution ends after it was replaced.
+        self.resolutions[0]("first")
+        self.resolutions[1]("second")
+        self.assertEqual([step for step in self.steps if step[0] == "zap"],
+                         [("zap", "second", "tv_page")])
+        self.assertEqual(self.results, [False, True])
+
+    def test_cancel_current(self):
+        self._pipeline().start()
+        ZapPipeline.cancel_current()
+        self.resolutions[0]("channel")
+        self.assertEqual(self.steps, ["resolve", "prepare"])
+        self.assertEqual(self.results, [False])
+
+
+if __name__ == "__main__":
+    unittest.main()
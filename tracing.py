@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Timeline tracing
+
+Records named spans, instant events and waits and dumps them in the
+Chrome trace event format (open the file in chrome://tracing or
+Perfetto).
+"""
+import json
+import os
+import time
+
+from peewee.debug import GET_LOGGER
+
+
+log = GET_LOGGER(__name__)
+
+DISABLED_VALUES = ("", "0", "n", "no", "false")
+
+
+def trace_output_path(env_name, default):
+    """Return the dump path set in ``env_name``, ``None`` if disabled."""
+    path = os.getenv(env_name, default)
+    if path.lower() in DISABLED_VALUES:
+        return None
+    return path
+
+
+def _read_uptime():
+    try:
+        with open("/proc/uptime") as uptime:
+            return float(uptime.read().split()[0])
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
+class Timeline(object):
+
+    """Collect the timing of a sequence of named steps.
+
+    Spans are opened with :meth:`begin` and closed with :meth:`end`. A
+    span may be opened several times (e.g. a node restarted after a
+    failure), each run is recorded. :meth:`wait_for` attributes the
+    time spent by a span to the resource it is waiting on, until
+    :meth:`end_wait` is called or another resource is waited on.
+    """
+
+    def __init__(self, name, clock=time.time):
+        self.name = name
+        self._clock = clock
+        self.origin = clock()
+        self.uptime_at_origin = _read_uptime()
+        self.events = []
+        self.counters = {}
+        self.durations = {}
+        self.waits = {}
+        self.metadata = {}
+        self._open = {}
+        self._current_waits = {}
+        self._lanes = {}
+
+    def now(self):
+        return self._clock()
+
+    def _lane(self, category):
+        return self._lanes.setdefault(category, len(self._lanes) + 1)
+
+    def _record(self, name, category, start, end, args):
+        self.events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": int((start - self.origin) * 1e6),
+            "dur": int((end - start) * 1e6),
+            "pid": 1,
+            "tid": self._lane(category),
+            "args": args,
+        })
+        count, duration = self.durations.get(name, (0, 0.0))
+        self.durations[name] = (count + 1, duration + end - start)
+
+    def begin(self, name, category="node"):
+        self._open[(category, name)] = self.now()
+
+    def end(self, name, category="node", **args):
+        """Close the span and return its duration (``None`` if not open)."""
+        start = self._open.pop((category, name), None)
+        if start is None:
+            log.debug("Span %r/%r was not started.", category, name)
+            return None
+        end = self.now()
+        self._record(name, category, start, end, args)
+        return end - start
+
+    def complete(self, name, start, end=None, category="step", **args):
+        """Record an already finished span."""
+        self._record(name, category, start,
+                     self.now() if end is None else end, args)
+
+    def instant(self, name, category="event", **args):
+        self.events.append({
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "t",
+            "ts": int((self.now() - self.origin) * 1e6),
+            "pid": 1,
+            "tid": self._lane(category),
+            "args": args,
+        })
+
+    def count(self, name, counter="retries"):
+        key = (name, counter)
+        self.counters[key] = self.counters.get(key, 0) + 1
+        self.instant(name, category=counter, count=self.counters[key])
+
+    def wait_for(self, name, target):
+        """Attribute the time spent by span ``name`` to ``target``."""
+        current = self._current_waits.get(name)
+        if current is not None and current[0] == target:
+            return
+        self.end_wait(name)
+        self._current_waits[name] = (target, self.now())
+
+    def end_wait(self, name):
+        current = self._current_waits.pop(name, None)
+        if current is None:
+            return
+        target, start = current
+        end = self.now()
+        self._record("%s: %s" % (name, target), "wait", start, end,
+                     {"node": name, "target": target})
+        node_waits = self.waits.setdefault(name, {})
+        node_waits[target] = node_waits.get(target, 0.0) + end - start
+
+    def summary(self):
+        spans = dict((name, {"count": count, "duration": round(duration, 6)})
+                     for name, (count, duration)
+                     in self.durations.iteritems())
+        counters = {}
+        for (name, counter), value in self.counters.iteritems():
+            counters.setdefault(counter, {})[name] = value
+        waits = dict((name, dict((target, round(duration, 6))
+                                 for target, duration in targets.iteritems()))
+                     for name, targets in self.waits.iteritems())
+        return {
+            "name": self.name,
+            "total": round(self.now() - self.origin, 6),
+            "uptime_at_origin": self.uptime_at_origin,
+            "spans": spans,
+            "counters": counters,
+            "waits": waits,
+            "metadata": self.metadata,
+        }
+
+    def worst_wait(self):
+        """Return the ``(span, target, seconds)`` tuple that waited most."""
+        worst = None
+        for name, targets in self.waits.iteritems():
+            for target, duration in targets.iteritems():
+                if worst is None or duration > worst[2]:
+                    worst = (name, target, duration)
+        return worst
+
+    def worst_leaf_span(self, exclude=()):
+        """Return the ``(name, seconds)`` of the longest recorded span
+        enclosing no other recorded span, ``None`` if there is none.
+
+        Enclosing spans last at least as long as what they enclose, so
+        only leaves tell where the time went.
+        """
+        spans = [(event["ts"], event["ts"] + event["dur"], event["name"])
+                 for event in self.events
+                 if event["ph"] == "X" and event["name"] not in exclude]
+        worst = None
+        for start, end, name in spans:
+            if any(start <= other_start and other_end <= end and
+                   (other_start, other_end) != (start, end)
+                   for other_start, other_end, other_name in spans):
+                continue
+            if worst is None or end - start > worst[1]:
+                worst = (name, end - start)
+        if worst is None:
+            return None
+        return worst[0], worst[1] / 1e6
+
+    def to_chrome_trace(self):
+        events = list(self.events)
+        now = self.now()
+        # Spans still open at dump time are flagged as unfinished.
+        for (category, name), start in self._open.iteritems():
+            events.append({
+                "name": name, "cat": category, "ph": "X",
+                "ts": int((start - self.origin) * 1e6),
+                "dur": int((now - start) * 1e6),
+                "pid": 1, "tid": self._lane(category),
+                "args": {"unfinished": True},
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": self.summary(),
+        }
+
+    def dump(self, path):
+        """Write the timeline to ``path``, return ``True`` on success."""
+        tmp_path = "%s.tmp" % path
+        try:
+            with open(tmp_path, "w") as output:
+                json.dump(self.to_chrome_trace(), output)
+            os.rename(tmp_path, path)
+        except (IOError, OSError, TypeError, ValueError), e:
+            log.warning("Cannot dump %s timeline to %r: %r",
+                        self.name, path, e)
+            return False
+        log.info("%s timeline dumped to %r", self.name, path)
+        return True
@@ -12,6 +12,7 @@ from adele_app.custom_widget.clock.clock import (
     SHOW_SERVICE_PROFILE_SIGNAL, HIDE_SERVICE_PROFILE_SIGNAL,
     BLINK_PROFILE_NAME_SIGNAL, STOP_BLINK_PROFILE_NAME_SIGNAL
 )
+from adele_app.readiness import notify_view_states
 
 log = GET_LOGGER(__name__)
 
@@ -67,6 +68,9 @@ class UniverseMixin(object):
         if wuk.application.is_on_top(self):
             self.update_universe()
         super(UniverseMixin, self).on_stack_move(*args, **kwargs)
+        # The view states may have changed with the move, let the
+        # PagesClearedLatch waiting on this page check it now.
+        notify_view_states(self)
 
     def update_universe(self):
         log.info('Page %r on top: display_bc=%r, animate_bc=%r, '
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Webaccess cache
+
+Cache of the webaccess entries resolved by
+:func:`adele_app.facilities.iml_utils.get_webaccess`. Entries expire
+after ``WEBACCESS_TTL`` seconds and are all dropped when the
+``GLOBALINSTALL`` document, which defines them, is parsed again.
+Concurrent resolutions of the same entry share one request. A request
+in flight when the cache is dropped still answers its callers but its
+result is not cached.
+"""
+import time
+
+from peewee.debug import GET_LOGGER
+from peewee.misc_utils import MetaSingleton
+
+from leon_mal.services.ocid import OCIDService
+
+
+log = GET_LOGGER(__name__)
+
+# Seconds a resolved webaccess entry is kept.
+WEBACCESS_TTL = 3600.0
+# Broadcasted document defining the webaccess entries.
+WEBACCESS_DOCUMENT = "GLOBALINSTALL"
+
+
+class WebaccessCache(object):
+
+    __metaclass__ = MetaSingleton
+
+    def __init__(self, ttl=WEBACCESS_TTL):
+        self.ttl = ttl
+        #: Webaccess name -> (resolution time, service item).
+        self._entries = {}
+        #: (webaccess name, generation) -> callbacks waiting for its
+        #: resolution.
+        self._pending = {}
+        #: Incremented each time the cache is dropped.
+        self._generation = 0
+        self._registered = False
+
+    def invalidate(self, *args, **kwargs):
+        if self._entries:
+            log.info("%s parsed, dropping %d webaccess entries.",
+                     WEBACCESS_DOCUMENT, len(self._entries))
+        self._entries.clear()
+        self._generation += 1
+
+    def _register(self):
+        if not self._registered:
+            self._registered = True
+            OCIDService().register(self.invalidate,
+                                   document_parsing=WEBACCESS_DOCUMENT)
+
+    def get(self, name):
+        """Return the cached ``name`` entry, ``None`` if not fresh."""
+        try:
+            resolved_at, service = self._entries[name]
+        except KeyError:
+            return None
+        if time.time() - resolved_at > self.ttl:
+            del self._entries[name]
+            return None
+        return service
+
+    def resolve(self, name, callback=None):
+        """Call ``callback(service)`` with the ``name`` webaccess entry,
+        ``service`` being ``None`` if it cannot be resolved.
+        """
+        self._register()
+        service = self.get(name)
+        if service is not None:
+            if callback is not None:
+                callback(service)
+            return
+        key = (name, self._generation)
+        callbacks = self._pending.get(key)
+        if callbacks is not None:
+            if callback is not None:
+                callbacks.append(callback)
+            return
+        self._pending[key] = [callback] if callback is not None else []
+
+        from adele_app.facilities.iml_utils import get_webaccess
+
+        def _resolved(request):
+            service = None
+            if request.is_succeeded():
+                service = request.data["result"]
+                if key[1] == self._generation:
+                    self._entries[name] = (time.time(), service)
+                else:
+                    log.info("%s resolved before %s was parsed again, "
+                             "not cached.", name, WEBACCESS_DOCUMENT)
+            else:
+                log.error("Cannot get %s element from webaccess: %r", name,
+                          request)
+            for pending_callback in self._pending.pop(key, ()):
+                pending_callback(service)
+
+        get_webaccess(name, callback=_resolved)
+
+    def prewarm(self, names):
+        """Resolve ``names`` in the background."""
+        for name in names:
+            self.resolve(name)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Zap pipeline
+
+Run the resolution of the channel to zap to (usually a browse) while the
+zap is being prepared (TV page built, renderer connection open), then
+zap once both are done. The preparation must not change the screen: a
+failed or cancelled resolution leaves it as it was. A new pipeline
+cancels the one still in flight, so only the last zap key is honoured.
+"""
+from peewee.debug import GET_LOGGER
+
+
+log = GET_LOGGER(__name__)
+
+
+class ZapPipeline(object):
+
+    """Overlapped channel resolution and zap preparation.
+
+    ``resolve(callback)`` starts the channel resolution and calls
+    ``callback(channel)``, ``channel`` being ``None`` on failure.
+    ``prepare()`` is run right after, while the resolution is in flight,
+    and its result is passed to ``zap(channel, prepared)`` once the
+    channel is resolved. ``callback(zapped)`` is called when the
+    pipeline is over.
+    """
+
+    _current = None
+
+    def __init__(self, resolve, prepare, zap, callback=None):
+        self._resolve = resolve
+        self._prepare = prepare
+        self._zap = zap
+        self.callback = callback
+        self.cancelled = False
+        self._channel = None
+        self._resolved = False
+        self._prepared = None
+        self._is_prepared = False
+
+    def start(self):
+        current = ZapPipeline._current
+        if current is not None:
+            log.info("Zap pipeline %r replaced by %r.", current, self)
+            current.cancel()
+        ZapPipeline._current = self
+        # The resolution runs in other processes, start it first so it
+        # progresses while the main loop prepares the zap.
+        self._resolve(self._channel_resolved)
+        if self.cancelled:
+            return
+        if not (self._resolved and self._channel is None):
+            self._prepared = self._prepare()
+        self._is_prepared = True
+        self._join()
+
+    @classmethod
+    def cancel_current(cls):
+        """Cancel the pipeline in flight, if any."""
+        if cls._current is not None:
+            cls._current.cancel()
+
+    def cancel(self):
+        if self.cancelled or ZapPipeline._current is not self:
+            # Not in flight.
+            return
+        self.cancelled = True
+        self._prepared = None
+        self._done(False)
+
+    def _channel_resolved(self, channel):
+        if self.cancelled:
+            return
+        self._channel = channel
+        self._resolved = True
+        self._join()
+
+    def _join(self):
+        if not (self._resolved and self._is_prepared):
+            return
+        prepared, self._prepared = self._prepared, None
+        if self._channel is None:
+            # The preparation is dropped, nothing was shown.
+            self._done(False)
+            return
+        self._zap(self._channel, prepared)
+        self._done(True)
+
+    def _done(self, zapped):
+        if ZapPipeline._current is self:
+            ZapPipeline._current = None
+        if self.callback is not None:
+            self.callback(zapped)